@@ -0,0 +1,141 @@
+"""Persistent cache of Spotify artist metadata.
+
+Warm it with every artist in the library before a sort:
+
+    python ArtistCache.py warm
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+DB_FILE = 'spotify_artists.db'
+
+# Genres change rarely; re-fetch an artist after this long
+DEFAULT_TTL_SECONDS = int(os.getenv("ARTIST_CACHE_TTL_DAYS", 30)) * 24 * 60 * 60
+# Least recently used artists are evicted beyond this many entries
+DEFAULT_MAX_ENTRIES = int(os.getenv("ARTIST_CACHE_MAX_ENTRIES", 50000))
+
+# The parts of an artist object the sorters read
+CACHED_KEYS = ('id', 'name', 'genres')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS artists (
+    artist_id  TEXT PRIMARY KEY,
+    data       TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_used  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_artists_last_used ON artists (last_used);
+'''
+
+
+class ArtistCache:
+    """SQLite cache of artist objects keyed by artist ID.
+
+    Entries expire ``ttl`` seconds after they were fetched, and once there
+    are more than ``max_entries`` the least recently used ones are evicted.
+    Hits and misses are counted for the end-of-run report.
+    """
+
+    def __init__(self, path=DB_FILE, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def get_many(self, artist_ids):
+        """Return ({artist_id: artist} for fresh entries, [IDs to fetch]) for the distinct IDs given."""
+        unique_ids = list(dict.fromkeys(artist_id for artist_id in artist_ids if artist_id))
+        now = time.time()
+        found = {}
+        for i in range(0, len(unique_ids), 500):
+            chunk = unique_ids[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT artist_id, data FROM artists WHERE artist_id IN ({','.join('?' * len(chunk))}) "
+                f"AND fetched_at > ?", (*chunk, now - self.ttl))
+            found.update((artist_id, json.loads(data)) for artist_id, data in rows)
+
+        with self.conn:
+            self.conn.executemany('UPDATE artists SET last_used = ? WHERE artist_id = ?',
+                                  [(now, artist_id) for artist_id in found])
+        missing = [artist_id for artist_id in unique_ids if artist_id not in found]
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, artists):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany('''
+                INSERT INTO artists (artist_id, data, fetched_at, last_used) VALUES (?, ?, ?, ?)
+                ON CONFLICT (artist_id) DO UPDATE SET
+                    data = excluded.data,
+                    fetched_at = excluded.fetched_at,
+                    last_used = excluded.last_used
+            ''', [(artist['id'], json.dumps({key: artist.get(key) for key in CACHED_KEYS}), now, now)
+                  for artist in artists])
+            self._evict()
+
+    def _evict(self):
+        excess = self.count() - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                'DELETE FROM artists WHERE artist_id IN '
+                '(SELECT artist_id FROM artists ORDER BY last_used LIMIT ?)', (excess,))
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM artists').fetchone()[0]
+
+    def report(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({hit_rate:.0%} hit rate), {self.count()} artists cached"
+
+
+async def cached_artists_by_id(client, cache, artist_ids):
+    """AsyncSpotify.artists_by_id, fetching only the artists ``cache`` doesn't already hold."""
+    found, missing = cache.get_many(artist_ids)
+    fetched = await client.artists_by_id(missing)
+    cache.put_many(fetched.values())
+    return {**found, **fetched}
+
+
+def warm(scope='playlist-read-private'):
+    """Fetch every artist in the library store that isn't cached yet."""
+    from AsyncSpotify import get_async_spotify_client, run_async
+    from LibraryStore import LibraryStore
+    from RateLimiter import spotify_limiter
+
+    with LibraryStore() as store:
+        artist_ids = store.artist_ids()
+
+    async def fetch(cache):
+        async with get_async_spotify_client(scope) as client:
+            return await cached_artists_by_id(client, cache, artist_ids)
+
+    with ArtistCache() as cache:
+        run_async(fetch(cache))
+        print(f"Warmed the artist cache for {len(artist_ids)} library artists: {cache.report()}")
+    print(f"Rate limiter: {spotify_limiter.report()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the artist metadata cache.')
+    parser.add_argument('command', choices=['warm'], help='warm: preload every artist in the library')
+    args = parser.parse_args()
+    if args.command == 'warm':
+        warm()
@@ -0,0 +1,174 @@
+import asyncio
+import os
+
+import httpx
+
+from Pagination import with_paging_fields
+from RateLimiter import spotify_limiter
+from SpotifyClient import MAX_RATE_LIMIT_RETRIES, DEFAULT_TIMEOUT, build_session, get_auth_manager
+
+API_BASE_URL = 'https://api.spotify.com/v1/'
+# Requests in flight at once; the shared rate limiter still decides how fast they go out
+DEFAULT_CONCURRENCY = int(os.getenv("SPOTIFY_ASYNC_CONCURRENCY", 16))
+ARTIST_BATCH_SIZE = 50  # most IDs the artists endpoint takes per request
+
+
+class AsyncSpotify:
+    """Asyncio client for the read-heavy endpoints we call in bulk.
+
+    Covers playlist_tracks, artists, audio_features,
+    current_user_saved_episodes and search, with paging helpers that fan out
+    every page of a listing at once. A semaphore bounds how many requests are
+    in flight, and every request takes a token from the same TokenBucket the
+    spotipy clients use.
+
+    Use it as an async context manager so the connection pool gets closed:
+
+        async with get_async_spotify_client(scope) as client:
+            items = await client.all_playlist_tracks(playlist_id)
+    """
+
+    def __init__(self, auth_manager=None, concurrency=DEFAULT_CONCURRENCY, limiter=spotify_limiter,
+                 base_url=API_BASE_URL, transport=None, timeout=DEFAULT_TIMEOUT,
+                 max_rate_limit_retries=MAX_RATE_LIMIT_RETRIES):
+        self.auth_manager = auth_manager
+        self.limiter = limiter
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            transport=transport,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _auth_headers(self):
+        if self.auth_manager is None:
+            return {}
+        # Usually an in-memory lookup, but a refresh does blocking HTTP, so keep it off the loop
+        token = await asyncio.to_thread(self.auth_manager.get_access_token, as_dict=False)
+        return {'Authorization': f'Bearer {token}'}
+
+    async def _get(self, url, params=None):
+        if params:
+            params = {key: value for key, value in params.items() if value is not None}
+        async with self._semaphore:
+            for attempt in range(self.max_rate_limit_retries + 1):
+                if self.limiter is not None:
+                    await self.limiter.acquire_async()
+                response = await self._client.get(url, params=params, headers=await self._auth_headers())
+                if response.status_code == 429 and attempt < self.max_rate_limit_retries:
+                    retry_after = int(response.headers.get('Retry-After', 1))
+                    print(f"Rate limit exceeded. Pausing all requests for {retry_after} seconds... "
+                          f"(Attempt {attempt + 1} of {self.max_rate_limit_retries})")
+                    if self.limiter is not None:
+                        self.limiter.penalize(retry_after)
+                    else:
+                        await asyncio.sleep(retry_after)
+                    continue
+                response.raise_for_status()
+                return response.json()
+
+    async def next(self, page):
+        if not page.get('next'):
+            return None
+        results = await self._get(page['next'])
+        # Later search pages come back wrapped in their type, e.g. {'tracks': {...}}
+        if 'items' not in results and len(results) == 1:
+            results = list(results.values())[0]
+        return results
+
+    async def iter_pages(self, page):
+        """Yield ``page`` and every page after it by following ``next``."""
+        while page:
+            yield page
+            page = await self.next(page)
+
+    async def iter_items(self, page):
+        async for current in self.iter_pages(page):
+            for item in current['items']:
+                yield item
+
+    async def fan_out_pages(self, fetch_page, limit):
+        """Fetch a paged listing with every page after the first requested at once.
+
+        ``fetch_page(limit, offset)`` must return a Spotify paging object.
+        Pages come back in offset order.
+        """
+        first = await fetch_page(limit=limit, offset=0)
+        rest = await asyncio.gather(*(fetch_page(limit=limit, offset=offset)
+                                      for offset in range(limit, first['total'], limit)))
+        pages = [first, *rest]
+        # Items added since the first page was fetched
+        async for page in self.iter_pages(await self.next(pages[-1])):
+            pages.append(page)
+        return pages
+
+    async def playlist_tracks(self, playlist_id, fields=None, limit=100, offset=0, market=None,
+                              additional_types=('track',)):
+        return await self._get(f'playlists/{playlist_id}/tracks', params={
+            'fields': fields, 'limit': limit, 'offset': offset, 'market': market,
+            'additional_types': ','.join(additional_types)})
+
+    async def all_playlist_tracks(self, playlist_id, fields=None):
+        fields = with_paging_fields(fields, keys=('next', 'total'))
+
+        async def fetch_page(limit, offset):
+            return await self.playlist_tracks(playlist_id, fields=fields, limit=limit, offset=offset)
+
+        pages = await self.fan_out_pages(fetch_page, limit=100)
+        return [item for page in pages for item in page['items']]
+
+    async def artists(self, artist_ids):
+        return await self._get('artists', params={'ids': ','.join(artist_ids)})
+
+    async def artists_by_id(self, artist_ids):
+        """Look up every distinct artist in ``artist_ids``, 50 to a request, with all batches in flight at once.
+
+        Returns {artist_id: artist}; falsy IDs and IDs Spotify doesn't know are left out.
+        """
+        unique_ids = list(dict.fromkeys(artist_id for artist_id in artist_ids if artist_id))
+        batches = [unique_ids[i:i + ARTIST_BATCH_SIZE] for i in range(0, len(unique_ids), ARTIST_BATCH_SIZE)]
+        results = await asyncio.gather(*(self.artists(batch) for batch in batches))
+        return {artist['id']: artist for result in results for artist in result['artists'] if artist}
+
+    async def audio_features(self, track_ids):
+        results = await self._get('audio-features', params={'ids': ','.join(track_ids)})
+        return results['audio_features']
+
+    async def current_user_saved_episodes(self, limit=20, offset=0, market=None):
+        return await self._get('me/episodes', params={'limit': limit, 'offset': offset, 'market': market})
+
+    async def all_saved_episodes(self):
+        pages = await self.fan_out_pages(self.current_user_saved_episodes, limit=50)
+        return [item for page in pages for item in page['items']]
+
+    async def search(self, q, limit=10, offset=0, type='track', market=None):
+        return await self._get('search', params={
+            'q': q, 'limit': limit, 'offset': offset, 'type': type, 'market': market})
+
+
+def run_async(coro):
+    """Run ``coro`` to completion from a script or from a notebook cell."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Jupyter already runs an event loop; nest_asyncio lets us block on it
+    import nest_asyncio
+    nest_asyncio.apply()
+    return loop.run_until_complete(coro)
+
+
+def get_async_spotify_client(scope, concurrency=DEFAULT_CONCURRENCY):
+    # Token refreshes are rare and go through a small pooled, rate limited session
+    auth_manager = get_auth_manager(scope, session=build_session(pool_size=1))
+    return AsyncSpotify(auth_manager=auth_manager, concurrency=concurrency)
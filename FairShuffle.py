@@ -0,0 +1,57 @@
+import random
+from collections import defaultdict
+from operator import itemgetter
+
+# How far a track may drift from its evenly spaced slot, as a share of the gap between slots
+JITTER = 0.2
+
+
+def _spread(items, key, rng, arrange):
+    """``items`` with every ``key`` group spaced evenly through the result.
+
+    Each group of k items, in the order ``arrange`` gives it, is laid on
+    [0, 1) at a random offset plus i / k, nudged by up to JITTER of a gap
+    so groups of the same size don't lock step. Sorting all positions
+    interleaves the groups; a group's items stay in order since a nudge
+    never spans a whole gap.
+    """
+    groups = defaultdict(list)
+    for item in items:
+        groups[key(item)].append(item)
+    placed = []
+    for group in groups.values():
+        group = arrange(group)
+        gap = 1 / len(group)
+        offset = rng.random() * gap
+        for i, item in enumerate(group):
+            placed.append((offset + i * gap + (rng.random() - 0.5) * JITTER * gap, item))
+    placed.sort(key=itemgetter(0))
+    return [item for _, item in placed]
+
+
+def fair_shuffle(items, artist, album=None, seed=None, rng=None):
+    """Shuffle ``items`` so tracks by the same artist, and from the same album, are spread out.
+
+    ``artist`` and ``album`` map an item to its artist and album; items whose
+    key is None are spread as one group. Each artist's tracks are first
+    interleaved by album, then the artists are interleaved with each other.
+    Sorting the positions makes it O(n log n). The same ``seed`` gives the
+    same order, and ``rng`` takes a random.Random to draw from instead.
+    """
+    rng = rng or random.Random(seed)
+
+    def shuffled(group):
+        group = list(group)
+        rng.shuffle(group)
+        return group
+
+    def by_album(group):
+        return _spread(group, album, rng, shuffled)
+
+    return _spread(items, artist, rng, by_album if album else shuffled)
+
+
+def adjacent_repeats(items, key):
+    """How many neighbouring pairs share a ``key``, e.g. the same artist back to back."""
+    keys = [key(item) for item in items]
+    return sum(1 for a, b in zip(keys, keys[1:]) if a is not None and a == b)
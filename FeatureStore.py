@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+
+FEATURES_FILE = 'audio_features.npy'
+IDS_FILE = 'audio_features_ids.npy'
+
+# The audio features the genre classifier trains on, in column order
+FEATURE_COLUMNS = ['danceability', 'energy', 'speechiness', 'acousticness',
+                   'instrumentalness', 'liveness', 'valence', 'tempo']
+
+ID_DTYPE = 'S22'  # Spotify track IDs are 22 base62 characters
+BATCH_SIZE = 100  # most IDs the audio-features endpoint takes per request
+
+
+def _save(path, array):
+    # Write beside the target and swap it in, so a crash never leaves half a file
+    tmp = path + '.tmp.npy'
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+class FeatureStore:
+    """Audio features on disk, keyed by track ID.
+
+    Two .npy files: a float32 matrix with one row per track and one column
+    per FEATURE_COLUMNS entry, and the sorted track IDs labelling its rows.
+    The matrix is memory-mapped and IDs are found by binary search, so
+    opening a store of 100k tracks takes milliseconds. Tracks Spotify has
+    no features for are stored as NaN rows, so they aren't asked for again.
+    """
+
+    def __init__(self, features_path=FEATURES_FILE, ids_path=IDS_FILE):
+        self.features_path = features_path
+        self.ids_path = ids_path
+        if os.path.exists(ids_path):
+            self.ids = np.load(ids_path)
+            self.features = np.load(features_path, mmap_mode='r')
+            if len(self.ids) != len(self.features):
+                raise ValueError(f"{ids_path} and {features_path} are out of step; delete both to rebuild the store")
+        else:
+            self.ids = np.empty(0, dtype=ID_DTYPE)
+            self.features = np.empty((0, len(FEATURE_COLUMNS)), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _rows(self, track_ids):
+        """(row of each ID in the matrix, whether it is stored at all)."""
+        keys = np.asarray(track_ids, dtype=ID_DTYPE)
+        if not len(self.ids):
+            return np.zeros(len(keys), dtype=np.intp), np.zeros(len(keys), dtype=bool)
+        rows = np.minimum(np.searchsorted(self.ids, keys), len(self.ids) - 1)
+        return rows, self.ids[rows] == keys
+
+    def get(self, track_ids):
+        """Feature matrix for ``track_ids``, in order; NaN rows for tracks without features."""
+        rows, stored = self._rows(track_ids)
+        matrix = np.full((len(rows), len(FEATURE_COLUMNS)), np.nan, dtype=np.float32)
+        matrix[stored] = self.features[rows[stored]]
+        return matrix
+
+    def missing(self, track_ids):
+        """The distinct ``track_ids`` the store has never fetched, in first-seen order."""
+        track_ids = list(dict.fromkeys(track_ids))
+        _, stored = self._rows(track_ids)
+        return [track_id for track_id, known in zip(track_ids, stored) if not known]
+
+    def add(self, features):
+        """Store Spotify audio feature objects, or None for a track that has none, by track ID."""
+        if not features:
+            return
+        new_ids = np.asarray(list(features), dtype=ID_DTYPE)
+        new_rows = np.array([[np.nan] * len(FEATURE_COLUMNS) if f is None else [f[column] for column in FEATURE_COLUMNS]
+                             for f in features.values()], dtype=np.float32)
+        ids = np.concatenate([self.ids, new_ids])
+        matrix = np.concatenate([self.features, new_rows])
+        # Later rows win, so re-adding a track replaces its features
+        _, last = np.unique(ids[::-1], return_index=True)
+        order = len(ids) - 1 - last
+        self.ids, self.features = ids[order], matrix[order]
+        _save(self.features_path, self.features)
+        _save(self.ids_path, self.ids)
+
+    def fetch(self, sp, track_ids, batch_size=BATCH_SIZE):
+        """Feature matrix for ``track_ids``, asking Spotify only for tracks the store hasn't seen."""
+        missing = self.missing(track_ids)
+        fetched = {}
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i + batch_size]
+            fetched.update(zip(batch, sp.audio_features(batch)))
+        self.add(fetched)
+        return self.get(track_ids)
+
+
+def valid_rows(matrix):
+    """Boolean mask of the rows with every feature present."""
+    return ~np.isnan(matrix).any(axis=1)
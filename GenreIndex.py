@@ -0,0 +1,54 @@
+import json
+
+GENRE_MAPPING_FILE = 'genre_mapping.json'
+DEFAULT_BUCKET = 'Other'
+
+
+def normalize_genre(genre):
+    # Spotify sends lower case; the mapping file is mostly capitalized
+    return ' '.join(genre.casefold().split())
+
+
+class GenreIndex:
+    """Compiled lookup from Spotify micro-genre to one of our macro buckets.
+
+    ``buckets`` maps each bucket to its genres, in priority order: when a
+    genre is listed under several buckets, the one listed first wins. The
+    default bucket always ranks last, so e.g. 'Uk post-punk' resolves to
+    Rock even though it is also listed under Other.
+    """
+
+    def __init__(self, buckets, default=DEFAULT_BUCKET):
+        self.default = default
+        self.buckets = [bucket for bucket in buckets if bucket != default] + [default]
+        self.rank = {bucket: rank for rank, bucket in enumerate(self.buckets)}
+        self.index = {}
+        for bucket in self.buckets:
+            for genre in buckets.get(bucket, ()):
+                self.index.setdefault(normalize_genre(genre), bucket)
+
+    @classmethod
+    def load(cls, path=GENRE_MAPPING_FILE, default=DEFAULT_BUCKET):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f), default=default)
+
+    def resolve(self, genre):
+        """The bucket ``genre`` is listed under, or None if it isn't mapped."""
+        return self.index.get(normalize_genre(genre))
+
+    def resolve_artist(self, genres, unmapped=None, resolve=None):
+        """The highest priority bucket among an artist's genres, or the default bucket.
+
+        Genres that aren't mapped are added to ``unmapped`` when given.
+        ``resolve`` replaces the per-genre lookup, e.g. with GenreRules.resolve.
+        """
+        resolve = resolve or self.resolve
+        best = None
+        for genre in genres:
+            bucket = resolve(genre)
+            if bucket is None:
+                if unmapped is not None:
+                    unmapped.add(genre.capitalize())
+            elif best is None or self.rank[bucket] < self.rank[best]:
+                best = bucket
+        return best or self.default
@@ -0,0 +1,212 @@
+"""The genre classifier as a saved artifact, so sorting doesn't retrain it every run.
+
+Train it from TLT_genres.csv once, and again whenever the training data changes:
+
+    python GenreModel.py train
+
+then sort 'Other TLT' into the genre playlists with the saved model:
+
+    python GenreModel.py sort [--dry-run]
+"""
+import argparse
+import functools
+import hashlib
+import json
+import pickle
+import time
+
+import numpy as np
+
+from FeatureStore import FEATURE_COLUMNS, valid_rows
+
+MODEL_FILE = 'genre_model.pkl'
+TRAINING_CSV = 'TLT_genres.csv'
+# The classifier's own move journal, apart from the rule-based sorters'
+JOURNAL_FILE = 'genre_classifier.journal'
+
+# Bump when the artifact layout changes; older artifacts must be retrained
+ARTIFACT_VERSION = 1
+
+
+class GenreModel:
+    """A fitted classifier with the labels and feature columns it was trained on.
+
+    Saved as one file: a JSON header line, then the pickled classifier and
+    label encoder. The header records the artifact version, the feature
+    schema, the labels and a SHA-256 of the pickle, and all of them are
+    checked before anything is unpickled, so a stale or damaged artifact
+    fails with a clear message instead of predicting nonsense.
+    """
+
+    def __init__(self, classifier, label_encoder, feature_columns=FEATURE_COLUMNS, info=None):
+        self.classifier = classifier
+        self.label_encoder = label_encoder
+        self.feature_columns = list(feature_columns)
+        self.info = info or {}
+
+    @property
+    def labels(self):
+        return [str(label) for label in self.label_encoder.classes_]
+
+    @classmethod
+    def train(cls, features, labels, n_estimators=100, random_state=42):
+        """Fit on 80% of ``features`` (rows in FEATURE_COLUMNS order) and score on the rest."""
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.metrics import accuracy_score
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import LabelEncoder
+
+        label_encoder = LabelEncoder()
+        y = label_encoder.fit_transform(labels)
+        X = np.asarray(features, dtype=np.float32)
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=random_state)
+        classifier = RandomForestClassifier(n_estimators=n_estimators, random_state=random_state)
+        classifier.fit(X_train, y_train)
+        accuracy = accuracy_score(y_test, classifier.predict(X_test))
+        return cls(classifier, label_encoder, info={'accuracy': accuracy, 'training_rows': len(X),
+                                                    'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S')})
+
+    def predict(self, features):
+        """Predicted label per row of a (tracks x FEATURE_COLUMNS) matrix."""
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim != 2 or features.shape[1] != len(self.feature_columns):
+            raise ValueError(f"expected rows of {len(self.feature_columns)} features "
+                             f"({', '.join(self.feature_columns)}), got shape {features.shape}")
+        if not len(features):
+            return np.empty(0, dtype=object)
+        return self.label_encoder.inverse_transform(self.classifier.predict(features))
+
+    def save(self, path=MODEL_FILE):
+        import sklearn
+
+        body = pickle.dumps({'classifier': self.classifier, 'label_encoder': self.label_encoder},
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        header = {'version': ARTIFACT_VERSION, 'sha256': hashlib.sha256(body).hexdigest(),
+                  'feature_columns': self.feature_columns, 'labels': self.labels,
+                  'sklearn': sklearn.__version__, **self.info}
+        with open(path, 'wb') as f:
+            f.write(json.dumps(header).encode() + b'\n')
+            f.write(body)
+
+    @classmethod
+    def load(cls, path=MODEL_FILE, feature_columns=FEATURE_COLUMNS):
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            body = f.read()
+        if header.get('version') != ARTIFACT_VERSION:
+            raise ValueError(f"{path} is artifact version {header.get('version')}, expected {ARTIFACT_VERSION}; "
+                             f"run `python GenreModel.py train`")
+        if header['feature_columns'] != list(feature_columns):
+            raise ValueError(f"{path} was trained on {header['feature_columns']}, not {list(feature_columns)}; "
+                             f"run `python GenreModel.py train`")
+        if hashlib.sha256(body).hexdigest() != header['sha256']:
+            raise ValueError(f"{path} is damaged: its checksum doesn't match; run `python GenreModel.py train`")
+        payload = pickle.loads(body)
+        info = {key: value for key, value in header.items()
+                if key not in ('version', 'sha256', 'feature_columns', 'labels')}
+        return cls(payload['classifier'], payload['label_encoder'], header['feature_columns'], info)
+
+
+@functools.lru_cache(maxsize=None)
+def get_model(path=MODEL_FILE):
+    """The saved model, read from disk on first use and shared after that."""
+    return GenreModel.load(path)
+
+
+def train_from_csv(path=TRAINING_CSV):
+    """Train on a features CSV whose 'genre' column holds genre names, as GenreClassifier writes it."""
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    if pd.api.types.is_numeric_dtype(df['genre']):
+        raise ValueError(f"{path} holds encoded genres, which can't be mapped back to names reliably; "
+                         f"re-run the data collection cells in GenreClassifier.py")
+    return GenreModel.train(df[FEATURE_COLUMNS].to_numpy(), df['genre'].astype(str).tolist())
+
+
+def predict_tracks(model, feature_store, sp, track_ids):
+    """{track_id: predicted label} for every track with audio features, from one predict call.
+
+    Features for the whole playlist are fetched through the store and
+    stacked into one matrix; rows with missing features are masked out
+    before predicting, and each prediction is keyed by the track ID of its
+    row, so a missing row can never shift a label onto another track.
+    """
+    track_ids = list(dict.fromkeys(track_ids))
+    features = feature_store.fetch(sp, track_ids)
+    valid = valid_rows(features)
+    predictions = model.predict(features[valid])
+    return dict(zip(np.asarray(track_ids, dtype=object)[valid], predictions))
+
+
+def move_songs_to_genre_playlists(sp, model, source_playlist_id, genre_playlists, feature_store,
+                                  dry_run=False, names=None, journal=None):
+    """Move each track in the source playlist to the playlist of its predicted genre.
+
+    ``genre_playlists`` maps predicted labels to playlist IDs; tracks whose
+    label has no playlist, or that have no audio features, stay where they
+    are. Returns (moves, plan, failed).
+    """
+    from PlaylistMoves import Move, apply_plan, plan_moves
+    from Projections import SORTER_FIELDS, iter_tracks
+
+    tracks = list(iter_tracks(sp, source_playlist_id, fields=SORTER_FIELDS))
+    genres = predict_tracks(model, feature_store, sp, [track.id for track in tracks])
+
+    # Queue each song for its genre-specific playlist
+    moves = []
+    for track in tracks:
+        genre = genres.get(track.id)
+        genre_playlist_id = genre_playlists.get(genre)
+        if genre_playlist_id:
+            moves.append(Move(track.id, source_playlist_id, genre_playlist_id))
+            print(f"Moving {track.name} by {track.artist_name} to {genre} playlist.")
+    print(f"Predicted {len(genres)} of {len(tracks)} tracks; the rest have no audio features")
+
+    # Add to each genre playlist and remove from the source 100 tracks per call
+    plan = plan_moves(moves)
+    failed = apply_plan(sp, plan, dry_run=dry_run, names=names, journal=journal)
+    return moves, plan, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the genre classifier, or sort with the saved one.')
+    parser.add_argument('command', choices=['train', 'sort'])
+    parser.add_argument('--model', default=MODEL_FILE)
+    parser.add_argument('--dry-run', action='store_true', help='print the planned moves only')
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        model = train_from_csv()
+        model.save(args.model)
+        print(f"Saved {args.model}: {model.info['training_rows']} rows, labels {model.labels}, "
+              f"accuracy {model.info['accuracy'] * 100:.2f}%")
+        return
+
+    from FeatureStore import FeatureStore
+    from PlaylistMoves import MoveJournal, finish_pending
+    from PlaylistRegistry import PlaylistRegistry
+    from RateLimiter import spotify_limiter
+    from SpotifyClient import get_spotify_client
+
+    start = time.perf_counter()
+    model = get_model(args.model)
+    registry = PlaylistRegistry.load()
+    print(f"Loaded {args.model} (trained {model.info.get('trained_at')}) in {time.perf_counter() - start:.2f}s")
+
+    sp = get_spotify_client(scope='playlist-read-private playlist-modify-private playlist-modify-public')
+    source = registry.get('Other TLT')
+    genre_playlists = {genre: playlist.id for genre, playlist in registry.labels('classify').items()}
+    # Journaled, so an interrupted run is finished here before the next sort starts
+    journal = MoveJournal(JOURNAL_FILE)
+    if not args.dry_run and not finish_pending(sp, journal, names=registry.names()):
+        return
+    moves, plan, failed = move_songs_to_genre_playlists(
+        sp, model, source.id, genre_playlists, FeatureStore(), dry_run=args.dry_run,
+        names=registry.names(), journal=journal)
+    print(f"{'Planned' if args.dry_run else 'Moved'} {len(moves)} songs with {len(plan)} calls, {len(failed)} failed")
+    print(f"Rate limiter: {spotify_limiter.report()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import json
+import re
+from collections import defaultdict
+
+from GenreIndex import GenreIndex, normalize_genre
+
+GENRE_RULES_FILE = 'genre_rules.json'
+
+# Learned scores below this are too weak to move a genre out of the default bucket
+DEFAULT_MIN_SCORE = 0.6
+
+_END = object()
+
+
+def tokenize(genre):
+    # 'Hip-hop experimental' and 'hip hop' should share tokens
+    return [token for token in re.split(r'[\s\-]+', normalize_genre(genre)) if token]
+
+
+class GenreRules:
+    """Classifies micro-genres nobody listed, by token and suffix rules.
+
+    Rules are ``[pattern, bucket]`` pairs, tried in order, first match wins:
+
+        'hip hop'   the words anywhere in the genre
+        '* indie'   the genre ends with the words
+        'indie *'   the genre starts with the words
+        '*gaze'     the genre ends with the characters, e.g. 'countrygaze'
+        'indie*'    the genre starts with the characters, e.g. 'indietronica'
+
+    All patterns are compiled into tries, so classifying a genre walks it
+    once instead of testing every rule. Genres listed in the GenreIndex
+    resolve through it first, and genres no rule matches can fall back to
+    token weights learned from the index.
+    """
+
+    def __init__(self, rules, genre_index, learned=True, min_score=DEFAULT_MIN_SCORE):
+        self.genre_index = genre_index
+        self.min_score = min_score
+        self.rules = [(pattern, bucket) for pattern, bucket in rules]
+        self._words = {}
+        self._prefixes = {}
+        self._suffixes = {}
+        for order, (pattern, bucket) in enumerate(self.rules):
+            self._compile(pattern, (order, bucket))
+        self.token_weights = self._learn_token_weights() if learned else {}
+
+    @classmethod
+    def load(cls, path=GENRE_RULES_FILE, genre_index=None, **kwargs):
+        with open(path, encoding='utf-8') as f:
+            rules = json.load(f)
+        return cls(rules, genre_index or GenreIndex.load(), **kwargs)
+
+    def _compile(self, pattern, rule):
+        pattern = normalize_genre(pattern)
+        if ' ' not in pattern and pattern.startswith('*'):
+            self._insert(self._suffixes, reversed(pattern[1:]), rule)
+        elif ' ' not in pattern and pattern.endswith('*'):
+            self._insert(self._prefixes, pattern[:-1], rule)
+        else:
+            anchor = 'end' if pattern.startswith('* ') else 'start' if pattern.endswith(' *') else None
+            self._insert(self._words, tokenize(pattern.strip('* ')), (*rule, anchor))
+
+    @staticmethod
+    def _insert(trie, keys, rule):
+        node = trie
+        for key in keys:
+            node = node.setdefault(key, {})
+        node.setdefault(_END, []).append(rule)
+
+    @staticmethod
+    def _walk(trie, keys):
+        node = trie
+        for position, key in enumerate(keys):
+            node = node.get(key)
+            if node is None:
+                return
+            if _END in node:
+                yield position, node[_END]
+
+    def _learn_token_weights(self):
+        # How often each token appears under each bucket in the mapping, as a share of its appearances
+        counts = defaultdict(lambda: defaultdict(int))
+        for genre, bucket in self.genre_index.index.items():
+            for token in set(tokenize(genre)):
+                counts[token][bucket] += 1
+        return {token: {bucket: count / sum(by_bucket.values()) for bucket, count in by_bucket.items()}
+                for token, by_bucket in counts.items()}
+
+    def match_rule(self, genre):
+        """The bucket of the first rule matching ``genre``, or None."""
+        normalized = normalize_genre(genre)
+        tokens = tokenize(normalized)
+        best = None
+        for _, rules in self._walk(self._suffixes, reversed(normalized)):
+            best = min([best, *rules], key=_rule_order)
+        for _, rules in self._walk(self._prefixes, normalized):
+            best = min([best, *rules], key=_rule_order)
+        for start in range(len(tokens)):
+            for end, rules in self._walk(self._words, tokens[start:]):
+                end += start
+                for order, bucket, anchor in rules:
+                    if (anchor == 'start' and start != 0) or (anchor == 'end' and end != len(tokens) - 1):
+                        continue
+                    best = min([best, (order, bucket)], key=_rule_order)
+        return best[1] if best else None
+
+    def score(self, genre):
+        """(bucket, score) from the learned token weights, or (None, 0.0) if no token is known."""
+        scores = defaultdict(float)
+        # Unknown tokens, usually a city or country, say nothing about the bucket
+        known = [token for token in tokenize(genre) if token in self.token_weights]
+        for token in known:
+            for bucket, weight in self.token_weights[token].items():
+                scores[bucket] += weight / len(known)
+        if not scores:
+            return None, 0.0
+        # Ties go to the bucket GenreIndex ranks first
+        bucket = max(scores, key=lambda bucket: (scores[bucket], -self.genre_index.rank[bucket]))
+        return bucket, scores[bucket]
+
+    def resolve(self, genre):
+        """Bucket for ``genre``: listed, else by rule, else by learned score, else None."""
+        bucket = self.genre_index.resolve(genre) or self.match_rule(genre)
+        if bucket is None and self.token_weights:
+            bucket, score = self.score(genre)
+            if score < self.min_score:
+                bucket = None
+        return bucket
+
+    def resolve_artist(self, genres, unmapped=None):
+        """Like GenreIndex.resolve_artist, with rules and learned scores for genres it doesn't list."""
+        return self.genre_index.resolve_artist(genres, unmapped=unmapped, resolve=self.resolve)
+
+
+def _rule_order(rule):
+    return rule[0] if rule else float('inf')
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def vote(track_genres, genre_index, resolve=None, unmapped=None):
+    """Pick a bucket per track by letting every genre of every credited artist vote.
+
+    ``track_genres`` holds one list of genres per track, covering all of its
+    artists. Each genre is resolved once (through ``resolve``, by default
+    the index's own lookup) and casts one vote for its bucket. Votes for the
+    whole playlist are summed in a single bincount into a tracks x buckets
+    matrix. The winner is the argmax; ties go to the bucket GenreIndex ranks
+    first, and tracks with no votes fall back to the default bucket.
+
+    Returns (buckets, confidence): the winning bucket per track, and the
+    share of the track's votes that bucket received as a float array.
+    """
+    resolve = resolve or genre_index.resolve
+    columns = {bucket: column for column, bucket in enumerate(genre_index.buckets)}
+    default = columns[genre_index.default]
+
+    genre_columns = {}
+    for genres in track_genres:
+        for genre in genres:
+            if genre not in genre_columns:
+                bucket = resolve(genre)
+                if bucket is None and unmapped is not None:
+                    unmapped.add(genre.capitalize())
+                genre_columns[genre] = -1 if bucket is None else columns[bucket]
+
+    n_tracks, n_buckets = len(track_genres), len(columns)
+    counts = np.fromiter((len(genres) for genres in track_genres), dtype=np.int64, count=n_tracks)
+    rows = np.repeat(np.arange(n_tracks), counts)
+    cols = np.fromiter((genre_columns[genre] for genres in track_genres for genre in genres),
+                       dtype=np.int64, count=int(counts.sum()))
+    voted = cols >= 0
+    votes = np.bincount(rows[voted] * n_buckets + cols[voted], minlength=n_tracks * n_buckets)
+    votes = votes.reshape(n_tracks, n_buckets)
+
+    # Columns are in priority order and argmax returns the first maximum
+    winners = votes.argmax(axis=1)
+    totals = votes.sum(axis=1)
+    winners[totals == 0] = default
+    confidence = votes.max(axis=1) / np.maximum(totals, 1)
+    return [genre_index.buckets[column] for column in winners], confidence
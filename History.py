@@ -20,6 +20,7 @@ import pandas as pd
 import time
 from spotipy.oauth2 import SpotifyOAuth
 from dotenv import load_dotenv
+from SpotifyAuth import HeadlessSpotifyAuth
 import spotipy
 
 # Load variables from .env file into the environment
@@ -56,15 +57,6 @@ if not token_info:
     code = sp_oauth.parse_response_code(response)
     token_info = sp_oauth.get_access_token(code)
 
-class HeadlessSpotifyAuth(SpotifyOAuth):
-    def __init__(self, refresh_token, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.refresh_token_value = refresh_token
-
-    def get_access_token(self, code=None, as_dict=True, check_cache=True):
-        token_info = self.refresh_access_token(self.refresh_token_value)
-        return token_info if as_dict else token_info['access_token']
-
 REFRESH_TOKEN = token_info['refresh_token']
 
 sp = spotipy.Spotify(auth_manager=HeadlessSpotifyAuth(
@@ -0,0 +1,76 @@
+import csv
+import os
+import sqlite3
+
+DB_FILE = 'spotify_history.db'
+
+COLUMNS = ['played_at', 'track_name', 'artist', 'album', 'duration_ms', 'track_id']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS plays (
+    played_at   TEXT NOT NULL,
+    track_name  TEXT,
+    artist      TEXT,
+    album       TEXT,
+    duration_ms INTEGER,
+    track_id    TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_plays_played_at ON plays (played_at);
+'''
+
+
+class HistoryStore:
+    """Append-only SQLite log of recently played tracks.
+
+    A play is identified by its played_at timestamp. Appending inserts the
+    new rows and ignores ones already stored, so the cost of a run depends
+    on how many plays it brings in, not on how long the history is.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def append(self, rows):
+        """Insert play dicts (keyed by COLUMNS) not stored yet. Returns how many were new."""
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO plays ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                ([row[column] for column in COLUMNS] for row in rows))
+            return self.conn.total_changes - before
+
+    def is_empty(self):
+        # Unlike COUNT(*), this doesn't scan the table
+        return self.conn.execute('SELECT 1 FROM plays LIMIT 1').fetchone() is None
+
+    def latest_played_at(self):
+        """played_at of the newest stored play, or None when the store is empty."""
+        return self.conn.execute('SELECT MAX(played_at) FROM plays').fetchone()[0]
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM plays').fetchone()[0]
+
+    def import_csv(self, path):
+        """Load a listening_history.csv written by the old job. Returns how many plays were new."""
+        if not os.path.exists(path):
+            return 0
+        with open(path, newline='', encoding='utf-8') as f:
+            return self.append(csv.DictReader(f))
+
+    def export_csv(self, path):
+        """Write the whole history, oldest play first, in the old listening_history.csv layout."""
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM plays ORDER BY played_at"))
@@ -1,72 +1,56 @@
-import os
 import datetime
-import pandas as pd
-import time
-from spotipy.oauth2 import SpotifyOAuth
-from dotenv import load_dotenv
-import spotipy
+from RateLimiter import spotify_limiter
+from SpotifyClient import get_spotify_client
+from HistoryStore import DB_FILE, HistoryStore
 
-# Load variables from .env file into the environment
-load_dotenv()
-
-# Access the environment variables
-client_id = os.getenv("SPOTIPY_CLIENT_ID")
-client_secret = os.getenv("SPOTIPY_CLIENT_SECRET")
-redirect_uri = os.getenv("SPOTIPY_REDIRECT_URI")
+# Written by earlier versions of this job; imported into the store on its first run
 CSV_FILE = 'listening_history.csv'
 
-user_id = os.getenv("USER_ID")
-
 # Authenticate
-sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=client_id,
-                                               client_secret=client_secret,
-                                               redirect_uri=redirect_uri,
-                                               scope='user-read-recently-played'))
-
-sp_oauth = SpotifyOAuth(
-    client_id=client_id,
-    client_secret=client_secret,
-    redirect_uri=redirect_uri,
-    scope='user-read-recently-played'
-)
-
+sp = get_spotify_client(scope='user-read-recently-played')
 
-token_info = sp_oauth.get_cached_token()
-if not token_info:
-    auth_url = sp_oauth.get_authorize_url()
-    print(f"Go to this URL to authorize: {auth_url}")
-    response = input("Paste the URL you were redirected to: ")
 
-    code = sp_oauth.parse_response_code(response)
-    token_info = sp_oauth.get_access_token(code)
+PAGE_SIZE = 50  # most plays Spotify returns per request
 
-class HeadlessSpotifyAuth(SpotifyOAuth):
-    def __init__(self, refresh_token, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.refresh_token_value = refresh_token
 
-    def get_access_token(self, code=None, as_dict=True, check_cache=True):
-        token_info = self.refresh_access_token(self.refresh_token_value)
-        return token_info if as_dict else token_info['access_token']
+def played_at_ms(played_at):
+    # played_at looks like 2024-05-01T18:22:03.512Z; the `after` cursor wants Unix milliseconds
+    timestamp = datetime.datetime.fromisoformat(played_at.replace('Z', '+00:00'))
+    return int(timestamp.timestamp() * 1000)
 
-REFRESH_TOKEN = token_info['refresh_token']
 
-sp = spotipy.Spotify(auth_manager=HeadlessSpotifyAuth(
-    client_id=client_id,
-    client_secret=client_secret,
-    redirect_uri=redirect_uri,
-    refresh_token=REFRESH_TOKEN,
-    scope='user-read-recently-played'
-))
+def fetch_plays_after(after_ms):
+    """Every play newer than ``after_ms``, paging forward while full pages keep coming back."""
+    items = []
+    while True:
+        results = sp.current_user_recently_played(limit=PAGE_SIZE, after=after_ms)
+        items.extend(results['items'])
+        if len(results['items']) < PAGE_SIZE:
+            return items
+        newest = max(played_at_ms(item['played_at']) for item in results['items'])
+        if newest <= after_ms:
+            return items
+        after_ms = newest
 
 
 # === DOWNLOAD FUNCTION ===
 def fetch_and_append_recent_history():
     print(f"Fetching history at {datetime.datetime.now()}...")
-    results = sp.current_user_recently_played(limit=50)
+    with HistoryStore(DB_FILE) as store:
+        if store.is_empty():
+            imported = store.import_csv(CSV_FILE)
+            if imported:
+                print(f"Imported {imported} records from {CSV_FILE}.")
+        latest = store.latest_played_at()
+
+    # Only ask for plays newer than the last one stored
+    if latest:
+        items = fetch_plays_after(played_at_ms(latest))
+    else:
+        items = sp.current_user_recently_played(limit=PAGE_SIZE)['items']
     new_data = []
 
-    for item in results['items']:
+    for item in items:
         track = item['track']
         played_at = item['played_at']
         new_data.append({
@@ -78,19 +62,11 @@ def fetch_and_append_recent_history():
             'track_id': track['id']
         })
 
-    # Convert to DataFrame
-    df_new = pd.DataFrame(new_data)
-
-    if os.path.exists(CSV_FILE):
-        df_existing = pd.read_csv(CSV_FILE)
-        df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-        df_combined.drop_duplicates(subset=['played_at'], inplace=True)
-    else:
-        df_combined = df_new
-
-    df_combined.sort_values(by='played_at', inplace=True)
-    df_combined.to_csv(CSV_FILE, index=False)
-    print(f"Saved {len(df_new)} new records.")
+    # Any overlap between pages is skipped by the unique index on played_at
+    with HistoryStore(DB_FILE) as store:
+        saved = store.append(new_data)
+    print(f"Saved {saved} new records.")
 
 
-fetch_and_append_recent_history()
\ No newline at end of file
+fetch_and_append_recent_history()
+print(f"Rate limiter: {spotify_limiter.report()}")
@@ -67,14 +67,7 @@ token_info['refresh_token']
 from spotipy.oauth2 import SpotifyOAuth
 import spotipy
 
-class HeadlessSpotifyAuth(SpotifyOAuth):
-    def __init__(self, refresh_token, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.refresh_token_value = refresh_token
-
-    def get_access_token(self, code=None, as_dict=True, check_cache=True):
-        token_info = self.refresh_access_token(self.refresh_token_value)
-        return token_info if as_dict else token_info['access_token']
+from SpotifyAuth import HeadlessSpotifyAuth
 
 # Replace with your actual values
 REFRESH_TOKEN = token_info['refresh_token']
@@ -122,37 +115,29 @@ def rate_limited_request(func, *args, max_retries=5, **kwargs):
 
 # %%
 import pandas as pd
-
-# Get current user's playlists
-playlists = sp.current_user_playlists()
+from Pagination import iter_playlist_tracks, iter_user_playlists
 
 # Initialize a list to hold all track data
 tracks_data = []
 
-# Loop through each playlist
-for playlist in playlists['items']:
+# Loop through each of the current user's playlists, page by page
+for playlist in iter_user_playlists(sp):
     playlist_name = playlist['name']
     playlist_id = playlist['id']
     
     # Get all tracks in the playlist
-    results = sp.playlist_tracks(playlist_id)
-    
-    while results:
-        for item in results['items']:
-            track = item['track']
-            song_id = track['id']
-            song_name = track['name']
-            artist_name = track['artists'][0]['name']
-            
-            tracks_data.append({
-                'song_id': song_id,
-                'song_name': song_name,
-                'artist_name': artist_name,
-                'playlist_name': playlist_name
-            })
-        
-        # Pagination - Get next batch of tracks
-        results = sp.next(results) if results['next'] else None
+    for item in iter_playlist_tracks(sp, playlist_id):
+        track = item['track']
+        song_id = track['id']
+        song_name = track['name']
+        artist_name = track['artists'][0]['name']
+
+        tracks_data.append({
+            'song_id': song_id,
+            'song_name': song_name,
+            'artist_name': artist_name,
+            'playlist_name': playlist_name
+        })
 
 # Convert list to DataFrame
 df = pd.DataFrame(tracks_data)
@@ -0,0 +1,86 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from Projections import LIBRARY_FIELDS
+
+PAGE_SIZE = 100  # most tracks Spotify returns per playlist_tracks page
+DEFAULT_WORKERS = int(os.getenv("LIBRARY_CRAWL_WORKERS", 8))
+
+
+def track_row(item, playlist_name):
+    track = item['track']
+    return {
+        'song_id': track['id'],
+        'song_name': track['name'],
+        'artist_id': track['artists'][0]['id'],
+        'artist_name': track['artists'][0]['name'],
+        'album_id': (track.get('album') or {}).get('id'),
+        'playlist_name': playlist_name
+    }
+
+
+def _fetch_page(sp, playlist_id, offset):
+    return sp.playlist_tracks(playlist_id, fields=LIBRARY_FIELDS, limit=PAGE_SIZE, offset=offset)
+
+
+def crawl_playlists(sp, playlists, max_workers=DEFAULT_WORKERS):
+    """Fetch every track of every playlist with up to ``max_workers`` requests in flight.
+
+    The playlist listing already tells us how many tracks each playlist has,
+    so every page request is submitted up front. Returns one list of rows per
+    playlist, each in page order, so the result is identical to walking the
+    playlists one page at a time. The client's shared rate limiter still
+    paces the requests.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        playlist_pages = []
+        for playlist in playlists:
+            total = playlist['tracks']['total']
+            offsets = range(0, max(total, 1), PAGE_SIZE)
+            playlist_pages.append(
+                (playlist, [executor.submit(_fetch_page, sp, playlist['id'], offset) for offset in offsets]))
+
+        playlist_rows = []
+        for playlist, futures in playlist_pages:
+            rows = []
+            for future in futures:
+                results = future.result()
+                for item in results['items']:
+                    rows.append(track_row(item, playlist['name']))
+
+            # Tracks added since the playlist listing was fetched
+            while results['next']:
+                results = sp.next(results)
+                for item in results['items']:
+                    rows.append(track_row(item, playlist['name']))
+            playlist_rows.append(rows)
+
+    return playlist_rows
+
+
+def crawl_library(sp, playlists, max_workers=DEFAULT_WORKERS):
+    return [row for rows in crawl_playlists(sp, playlists, max_workers) for row in rows]
+
+
+async def crawl_playlists_async(client, playlists):
+    """Same rows as crawl_playlists, fetched on one event loop through an AsyncSpotify client."""
+    playlist_items = await asyncio.gather(*(client.all_playlist_tracks(playlist['id'], fields=LIBRARY_FIELDS) for playlist in playlists))
+    return [[track_row(item, playlist['name']) for item in items]
+            for playlist, items in zip(playlists, playlist_items)]
+
+
+async def crawl_library_async(client, playlists):
+    return [row for rows in await crawl_playlists_async(client, playlists) for row in rows]
+
+
+def changed_playlists(playlists, snapshots):
+    """Playlists whose snapshot_id or name differs from the last sync."""
+    changed = []
+    for playlist in playlists:
+        previous = snapshots.get(playlist['id'])
+        if (previous is None
+                or previous['snapshot_id'] != playlist['snapshot_id']
+                or previous['name'] != playlist['name']):
+            changed.append(playlist)
+    return changed
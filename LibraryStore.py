@@ -0,0 +1,174 @@
+import csv
+import sqlite3
+
+DB_FILE = 'spotify_library.db'
+
+# SQLite caps the number of ? parameters per statement
+MAX_PARAMS = 500
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tracks (
+    song_id     TEXT PRIMARY KEY,
+    song_name   TEXT,
+    artist_id   TEXT,
+    artist_name TEXT,
+    album_id    TEXT
+);
+CREATE TABLE IF NOT EXISTS playlists (
+    playlist_id   TEXT PRIMARY KEY,
+    playlist_name TEXT NOT NULL,
+    snapshot_id   TEXT,
+    position      INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS memberships (
+    playlist_id TEXT NOT NULL REFERENCES playlists (playlist_id) ON DELETE CASCADE,
+    position    INTEGER NOT NULL,
+    song_id     TEXT,
+    PRIMARY KEY (playlist_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_memberships_song_id ON memberships (song_id);
+CREATE INDEX IF NOT EXISTS idx_playlists_playlist_name ON playlists (playlist_name);
+
+-- Same shape as the old spotify_songs.csv, in playlist and track order
+CREATE VIEW IF NOT EXISTS library_songs AS
+SELECT m.song_id, t.song_name, t.artist_name, p.playlist_name
+FROM memberships m
+JOIN playlists p ON p.playlist_id = m.playlist_id
+LEFT JOIN tracks t ON t.song_id = m.song_id
+ORDER BY p.position, m.position;
+'''
+
+
+def _chunks(values, size=MAX_PARAMS):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class LibraryStore:
+    """SQLite copy of the user's library: tracks, playlists and which tracks are in which playlist.
+
+    Writes are upserts, so a sync only touches playlists that changed, and
+    readers get indexed lookups on song_id and playlist_name instead of
+    loading the whole library.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.executescript(SCHEMA)
+        # Stores created before album_id was crawled; their tracks pick it up as playlists change
+        if 'album_id' not in {row[1] for row in self.conn.execute('PRAGMA table_info(tracks)')}:
+            self.conn.execute('ALTER TABLE tracks ADD COLUMN album_id TEXT')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def snapshots(self):
+        """Return {playlist_id: {'snapshot_id': ..., 'name': ...}} as of the last sync."""
+        rows = self.conn.execute('SELECT playlist_id, snapshot_id, playlist_name FROM playlists')
+        return {playlist_id: {'snapshot_id': snapshot_id, 'name': name} for playlist_id, snapshot_id, name in rows}
+
+    def sync(self, playlists, changed, fetched_rows):
+        """Record the current playlist listing and the re-fetched rows of ``changed``.
+
+        ``fetched_rows`` holds one list of track rows per playlist in
+        ``changed``. Everything happens in one transaction, so a snapshot_id
+        is never stored without the tracks it describes.
+        """
+        with self.conn:
+            # Playlists deleted since the last sync take their memberships with them
+            current_ids = {playlist['id'] for playlist in playlists}
+            for playlist_id, in self.conn.execute('SELECT playlist_id FROM playlists').fetchall():
+                if playlist_id not in current_ids:
+                    self.conn.execute('DELETE FROM playlists WHERE playlist_id = ?', (playlist_id,))
+
+            self.conn.executemany('''
+                INSERT INTO playlists (playlist_id, playlist_name, snapshot_id, position) VALUES (?, ?, ?, ?)
+                ON CONFLICT (playlist_id) DO UPDATE SET
+                    playlist_name = excluded.playlist_name,
+                    snapshot_id = excluded.snapshot_id,
+                    position = excluded.position
+            ''', [(playlist['id'], playlist['name'], playlist['snapshot_id'], position)
+                  for position, playlist in enumerate(playlists)])
+
+            for playlist, rows in zip(changed, fetched_rows):
+                self.conn.execute('DELETE FROM memberships WHERE playlist_id = ?', (playlist['id'],))
+                self.conn.executemany(
+                    'INSERT INTO memberships (playlist_id, position, song_id) VALUES (?, ?, ?)',
+                    [(playlist['id'], position, row['song_id']) for position, row in enumerate(rows)])
+                self.conn.executemany('''
+                    INSERT INTO tracks (song_id, song_name, artist_id, artist_name, album_id) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (song_id) DO UPDATE SET
+                        song_name = excluded.song_name,
+                        artist_id = excluded.artist_id,
+                        artist_name = excluded.artist_name,
+                        album_id = excluded.album_id
+                ''', [(row['song_id'], row['song_name'], row['artist_id'], row['artist_name'], row['album_id'])
+                      for row in rows if row['song_id']])
+
+            # Tracks no playlist holds any more
+            self.conn.execute(
+                'DELETE FROM tracks WHERE song_id NOT IN (SELECT song_id FROM memberships WHERE song_id IS NOT NULL)')
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM memberships').fetchone()[0]
+
+    def artist_ids(self):
+        """Every distinct artist ID in the library."""
+        rows = self.conn.execute('SELECT DISTINCT artist_id FROM tracks WHERE artist_id IS NOT NULL')
+        return [artist_id for artist_id, in rows]
+
+    def track_metadata(self, song_ids):
+        """{song_id: (artist_id, album_id)} for the ``song_ids`` the store knows."""
+        metadata = {}
+        for chunk in _chunks(set(song_ids)):
+            rows = self.conn.execute(
+                f'SELECT song_id, artist_id, album_id FROM tracks WHERE song_id IN ({",".join("?" * len(chunk))})',
+                chunk)
+            metadata.update((song_id, (artist_id, album_id)) for song_id, artist_id, album_id in rows)
+        return metadata
+
+    def playlist_song_ids(self, playlist_id):
+        """Song IDs in a playlist, in playlist order."""
+        rows = self.conn.execute(
+            'SELECT song_id FROM memberships WHERE playlist_id = ? AND song_id IS NOT NULL ORDER BY position',
+            (playlist_id,))
+        return [song_id for song_id, in rows]
+
+    def songs_in_other_playlists(self, song_ids, exclude_name_glob):
+        """The subset of ``song_ids`` found in a playlist whose name does not match ``exclude_name_glob``.
+
+        GLOB rather than LIKE so the match is case sensitive, as ``'TLT' in name`` is.
+        """
+        found = set()
+        for chunk in _chunks(song_ids):
+            rows = self.conn.execute(f'''
+                SELECT DISTINCT m.song_id
+                FROM memberships m
+                JOIN playlists p ON p.playlist_id = m.playlist_id
+                WHERE m.song_id IN ({','.join('?' * len(chunk))})
+                  AND p.playlist_name NOT GLOB ?
+            ''', (*chunk, exclude_name_glob))
+            found.update(song_id for song_id, in rows)
+        return found
+
+    def playlists_matching(self, name_glob):
+        """(playlist_id, playlist_name) for playlists whose name matches ``name_glob``, in listing order."""
+        return self.conn.execute(
+            'SELECT playlist_id, playlist_name FROM playlists WHERE playlist_name GLOB ? ORDER BY position',
+            (name_glob,)).fetchall()
+
+    def export_csv(self, path):
+        """Write the library in the old spotify_songs.csv layout."""
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['song_id', 'song_name', 'artist_name', 'playlist_name'])
+            writer.writerows(self.conn.execute('SELECT * FROM library_songs'))
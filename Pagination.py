@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def iter_pages(sp, page, prefetch=True):
+    """Yield ``page`` and every page after it by following ``next``.
+
+    With ``prefetch`` the next page is requested in a background thread
+    while the caller is still working on the current one, so network waits
+    overlap with processing. Only one page is held besides the current one,
+    so memory stays flat however long the listing is.
+    """
+    if not prefetch:
+        while page:
+            yield page
+            page = sp.next(page) if page.get('next') else None
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        while page:
+            upcoming = executor.submit(sp.next, page) if page.get('next') else None
+            yield page
+            page = upcoming.result() if upcoming else None
+
+
+def iter_items(sp, page, prefetch=True):
+    for current in iter_pages(sp, page, prefetch=prefetch):
+        yield from current['items']
+
+
+def with_paging_fields(fields, keys=('next',)):
+    # A trimmed response still needs the paging keys for us to keep paging
+    if fields:
+        fields = ','.join([fields] + [key for key in keys if key not in fields.split(',')])
+    return fields
+
+
+def iter_user_playlists(sp, limit=50, prefetch=True):
+    """Yield every playlist of the current user, not just the first page."""
+    return iter_items(sp, sp.current_user_playlists(limit=limit), prefetch=prefetch)
+
+
+def iter_playlist_tracks(sp, playlist_id, fields=None, limit=100, prefetch=True):
+    """Yield every item of a playlist, optionally trimmed with Spotify's ``fields`` filter."""
+    first = sp.playlist_items(playlist_id, fields=with_paging_fields(fields), limit=limit, additional_types=('track',))
+    return iter_items(sp, first, prefetch=prefetch)
@@ -0,0 +1,335 @@
+"""Batched, journaled playlist moves.
+
+If a run is interrupted, replay the batches it didn't finish with:
+
+    python PlaylistMoves.py resume [--journal PATH]
+
+or, if they can never succeed, drop them so the next sort can start:
+
+    python PlaylistMoves.py discard [--journal PATH]
+"""
+import argparse
+import json
+import os
+import threading
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+BATCH_SIZE = 100  # most items Spotify takes per add or remove call
+DEFAULT_WORKERS = int(os.getenv("PLAYLIST_MOVE_WORKERS", 4))
+JOURNAL_FILE = 'playlist_moves.journal'
+
+# What a resume reads of a destination playlist to skip tracks an add already committed
+ADDED_FIELDS = 'items(track(id,uri)),next'
+
+# Move a track (ID or URI) from one playlist to another
+Move = namedtuple('Move', ['item', 'source', 'destination'])
+# One API call: add ('add') or remove every occurrence of ('remove') up to 100 items
+Batch = namedtuple('Batch', ['action', 'playlist_id', 'items'])
+
+
+def _chunks(items, size):
+    return [tuple(items[i:i + size]) for i in range(0, len(items), size)]
+
+
+def plan_moves(moves, batch_size=BATCH_SIZE):
+    """Group moves into add batches per destination, then remove batches per source.
+
+    Adds come first so a track is never missing from both playlists.
+    Moves onto their own source playlist and repeated moves are dropped.
+    """
+    adds = defaultdict(dict)
+    removes = defaultdict(dict)
+    for move in moves:
+        if move.source == move.destination:
+            continue
+        adds[move.destination][move.item] = None
+        removes[move.source][move.item] = None
+    plan = [Batch('add', playlist_id, chunk)
+            for playlist_id, items in adds.items() for chunk in _chunks(list(items), batch_size)]
+    plan += [Batch('remove', playlist_id, chunk)
+             for playlist_id, items in removes.items() for chunk in _chunks(list(items), batch_size)]
+    return plan
+
+
+def plan_removals(removals, batch_size=BATCH_SIZE):
+    """Remove batches for {playlist_id: items to remove from it}."""
+    return [Batch('remove', playlist_id, chunk)
+            for playlist_id, items in removals.items() for chunk in _chunks(list(dict.fromkeys(items)), batch_size)]
+
+
+def describe_plan(plan, names=None):
+    """One line per batch, with playlist names from ``names`` when given."""
+    names = names or {}
+    lines = [f"{len(plan)} calls planned"]
+    for batch in plan:
+        direction = 'to' if batch.action == 'add' else 'from'
+        lines.append(f"  {batch.action} {len(batch.items):3} tracks {direction} "
+                     f"{names.get(batch.playlist_id, batch.playlist_id)}")
+    return '\n'.join(lines)
+
+
+def failed_items(failed, action):
+    """{(playlist_id, item)} for every item in the ``failed`` batches of ``action``."""
+    return {(batch.playlist_id, item) for batch in failed if batch.action == action for item in batch.items}
+
+
+def _run_batch(sp, batch):
+    if batch.action == 'add':
+        sp.playlist_add_items(batch.playlist_id, list(batch.items))
+    else:
+        sp.playlist_remove_all_occurrences_of_items(batch.playlist_id, list(batch.items))
+
+
+class MoveJournal:
+    """Write-ahead journal of a move plan, so an interrupted run can be resumed.
+
+    The whole plan is written and synced to disk before the first API call,
+    one JSON line per batch, and a ``{"done": seq}`` line is appended as
+    each batch commits. Batches Spotify rejects for good, e.g. with a 404
+    for a deleted playlist, are marked done as abandoned rather than
+    retried forever. Resuming replays only batches with no done line.
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        batches, done, abandoned = {}, set(), set()
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if 'done' in entry:
+                        done.add(entry['done'])
+                        if entry.get('abandoned'):
+                            abandoned.add(entry['done'])
+                    else:
+                        batches[entry['seq']] = Batch(entry['action'], entry['playlist_id'], tuple(entry['items']))
+        return batches, done, abandoned
+
+    def pending(self):
+        """[(seq, Batch)] recorded but not yet done, in plan order."""
+        batches, done, _ = self._read()
+        return [(seq, batch) for seq, batch in sorted(batches.items()) if seq not in done]
+
+    def abandoned(self):
+        """Batches given up on after Spotify rejected them for good."""
+        batches, _, abandoned = self._read()
+        return [batches[seq] for seq in sorted(abandoned)]
+
+    def record(self, plan):
+        if self.pending():
+            raise RuntimeError(f"{self.path} has unfinished batches; run `python PlaylistMoves.py resume "
+                               f"--journal {self.path}` first, or `discard` them")
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for seq, batch in enumerate(plan):
+                f.write(json.dumps({'seq': seq, **batch._asdict()}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        return list(enumerate(plan))
+
+    def mark_done(self, seq, abandoned=False):
+        entry = {'done': seq, 'abandoned': True} if abandoned else {'done': seq}
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _is_permanent(error):
+    # A 4xx other than an expired token or a rate limit fails the same way every time
+    status = getattr(error, 'http_status', None)
+    return status is not None and 400 <= status < 500 and status not in (401, 429)
+
+
+def _run_per_playlist(sp, steps, max_workers, journal=None):
+    """Run (seq, Batch, complete) steps concurrently across playlists, in order within each.
+
+    Steps that ran in full are marked done in ``journal``, and steps Spotify
+    rejected for good are marked abandoned. Returns (failed, abandoned) batches.
+    """
+    by_playlist = defaultdict(list)
+    for step in steps:
+        by_playlist[step[1].playlist_id].append(step)
+
+    def run_playlist(playlist_steps):
+        failed, abandoned = [], []
+        for seq, batch, complete in playlist_steps:
+            try:
+                _run_batch(sp, batch)
+            except Exception as e:
+                print(f"Error running {batch.action} of {len(batch.items)} tracks on {batch.playlist_id}: {e}")
+                failed.append(batch)
+                if _is_permanent(e):
+                    abandoned.append(batch)
+                    if journal is not None:
+                        journal.mark_done(seq, abandoned=True)
+                continue
+            if journal is not None and complete:
+                journal.mark_done(seq)
+        return failed, abandoned
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(run_playlist, by_playlist.values()))
+    return ([batch for failed, _ in results for batch in failed],
+            [batch for _, abandoned in results for batch in abandoned])
+
+
+def _apply(sp, steps, max_workers, journal):
+    adds = [(seq, batch, True) for seq, batch in steps if batch.action == 'add']
+    failed, abandoned = _run_per_playlist(sp, adds, max_workers, journal)
+
+    # Tracks whose add failed stay in their source playlist: for good if the add was abandoned,
+    # in this run or an earlier one, otherwise until a resume gets them added
+    if journal is not None:
+        abandoned = journal.abandoned()
+    given_up = {item for batch in abandoned if batch.action == 'add' for item in batch.items}
+    retrying = {item for batch in failed if batch.action == 'add' for item in batch.items} - given_up
+
+    removes = []
+    for seq, batch in steps:
+        if batch.action == 'remove':
+            items = tuple(item for item in batch.items if item not in given_up and item not in retrying)
+            # A remove trimmed for a retrying add stays pending so a resume removes the rest once it's added
+            complete = retrying.isdisjoint(batch.items)
+            if items:
+                removes.append((seq, batch._replace(items=items), complete))
+            elif complete and journal is not None:
+                journal.mark_done(seq)
+    remove_failed, _ = _run_per_playlist(sp, removes, max_workers, journal)
+    failed += remove_failed
+
+    if journal is not None and not journal.pending():
+        journal.clear()
+    return failed
+
+
+def apply_plan(sp, plan, max_workers=DEFAULT_WORKERS, dry_run=False, names=None, journal=None):
+    """Run a plan from plan_moves: every add batch, then the remove batches.
+
+    Batches for different playlists run concurrently. Tracks whose add
+    failed are kept out of the removes, so a failure leaves them where they
+    were rather than losing them. With ``dry_run`` the plan is only printed.
+    With a ``journal`` the plan is recorded first and can be finished by
+    resume_plan after a crash; the journal is cleared once everything is done.
+    Returns the batches that failed.
+    """
+    if dry_run:
+        print(describe_plan(plan, names))
+        return []
+    steps = journal.record(plan) if journal is not None else list(enumerate(plan))
+    return _apply(sp, steps, max_workers, journal)
+
+
+def move_and_report(sp, genre_tracks, playlists, source='Other', max_workers=DEFAULT_WORKERS, dry_run=False,
+                    names=None, journal=None):
+    """Move every bucket's tracks out of the ``source`` bucket's playlist and print what each bucket got.
+
+    ``genre_tracks`` maps buckets to track IDs and ``playlists`` maps buckets
+    to playlist IDs. The moves run through apply_plan; per bucket it prints
+    how many distinct tracks would be added on a dry run, or were added
+    otherwise. Returns (plan, failed).
+    """
+    source_id = playlists[source]
+    moves = [Move(track_id, source_id, playlists[genre])
+             for genre, track_ids in genre_tracks.items() if genre != source for track_id in track_ids]
+    plan = plan_moves(moves)
+    failed = apply_plan(sp, plan, max_workers=max_workers, dry_run=dry_run, names=names, journal=journal)
+    not_added = failed_items(failed, 'add')
+    for genre, track_ids in genre_tracks.items():
+        if genre == source:
+            continue
+        # A track listed twice in the source is still only added once
+        track_ids = set(track_ids)
+        if dry_run:
+            print(f"Would add {len(track_ids)} songs to '{genre}'")
+        else:
+            added = sum(1 for track_id in track_ids if (playlists[genre], track_id) not in not_added)
+            print(f"Added {added} of {len(track_ids)} songs to '{genre}'")
+    print(f"{len(plan)} calls, {len(failed)} failed")
+    return plan, failed
+
+
+def _skip_committed_adds(sp, steps, journal):
+    """Drop tracks already in the destination from replayed adds.
+
+    An add that went through just before a crash, but was not yet marked
+    done, would otherwise add its tracks a second time; removes are
+    idempotent and replay as they are.
+    """
+    from Projections import iter_tracks
+
+    present = {}
+    kept = []
+    for seq, batch in steps:
+        if batch.action == 'add':
+            if batch.playlist_id not in present:
+                present[batch.playlist_id] = {key for track in iter_tracks(sp, batch.playlist_id, fields=ADDED_FIELDS)
+                                              for key in (track.id, track.uri)}
+            items = tuple(item for item in batch.items if item not in present[batch.playlist_id])
+            if not items:
+                journal.mark_done(seq)
+                continue
+            batch = batch._replace(items=items)
+        kept.append((seq, batch))
+    return kept
+
+
+def resume_plan(sp, journal, max_workers=DEFAULT_WORKERS, dry_run=False, names=None):
+    """Replay the batches ``journal`` has not marked done. Returns the batches that failed."""
+    steps = journal.pending()
+    if dry_run:
+        print(describe_plan([batch for _, batch in steps], names))
+        return []
+    return _apply(sp, _skip_committed_adds(sp, steps, journal), max_workers, journal)
+
+
+def finish_pending(sp, journal, max_workers=DEFAULT_WORKERS, names=None):
+    """Resume whatever ``journal`` left unfinished. True once nothing is pending, so a new plan can start."""
+    steps = journal.pending()
+    if steps:
+        failed = resume_plan(sp, journal, max_workers=max_workers, names=names)
+        print(f"Resumed {len(steps)} unfinished batches from {journal.path}, {len(failed)} failed")
+    if journal.pending():
+        print(f"{journal.path} still has unfinished batches; retry them with `python PlaylistMoves.py resume "
+              f"--journal {journal.path}` or drop them with `python PlaylistMoves.py discard --journal {journal.path}`")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Finish, or drop, an interrupted playlist move plan.')
+    parser.add_argument('command', choices=['resume', 'discard'])
+    parser.add_argument('--journal', default=JOURNAL_FILE)
+    parser.add_argument('--dry-run', action='store_true', help='print the unfinished batches only')
+    args = parser.parse_args()
+
+    from RateLimiter import spotify_limiter
+    from SpotifyClient import get_spotify_client
+
+    journal = MoveJournal(args.journal)
+    steps = journal.pending()
+    if not steps:
+        print(f"Nothing to resume in {args.journal}")
+        return
+    if args.command == 'discard':
+        if not args.dry_run:
+            journal.clear()
+        print(f"{'Would drop' if args.dry_run else 'Dropped'} {len(steps)} unfinished batches from {args.journal}")
+        return
+    sp = get_spotify_client(scope='playlist-read-private playlist-modify-private playlist-modify-public')
+    failed = resume_plan(sp, journal, dry_run=args.dry_run)
+    print(f"Replayed {len(steps)} unfinished batches, {len(failed)} failed")
+    print(f"Rate limiter: {spotify_limiter.report()}")
+
+
+if __name__ == '__main__':
+    main()
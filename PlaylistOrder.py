@@ -0,0 +1,101 @@
+import os
+import random
+from bisect import bisect_left
+from collections import namedtuple
+
+BATCH_SIZE = 100  # most items Spotify takes per replace or add call
+DEFAULT_WORKERS = int(os.getenv("SHUFFLE_WORKERS", 8))
+
+# One playlist_reorder_items call: move range_length items from range_start to before insert_before
+Reorder = namedtuple('Reorder', ['range_start', 'range_length', 'insert_before'])
+
+
+def partial_shuffle(items, fraction, rng=random):
+    """Copy of ``items`` with a random ``fraction`` of the positions shuffled among themselves."""
+    items = list(items)
+    positions = rng.sample(range(len(items)), round(len(items) * fraction))
+    values = [items[position] for position in positions]
+    rng.shuffle(values)
+    for position, value in zip(positions, values):
+        items[position] = value
+    return items
+
+
+def _longest_increasing(sequence):
+    """The values of one longest strictly increasing subsequence of ``sequence``."""
+    tails, tail_at, previous = [], [], [None] * len(sequence)
+    for i, value in enumerate(sequence):
+        length = bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_at.append(i)
+        else:
+            tails[length] = value
+            tail_at[length] = i
+        previous[i] = tail_at[length - 1] if length else None
+    kept, i = set(), tail_at[-1] if tail_at else None
+    while i is not None:
+        kept.add(sequence[i])
+        i = previous[i]
+    return kept
+
+
+def plan_reorder(order):
+    """playlist_reorder_items calls that turn positions 0..n-1 into ``order``.
+
+    ``order`` lists the current positions in their target order. Tracks on
+    a longest increasing run of ``order`` already sit in the right relative
+    order and never move, so the number of tracks moved is the minimum
+    possible; every other track is moved to just after its target
+    predecessor, and neighbours that travel together go in one range move.
+    Positions in each Reorder are as of just before that call, the way
+    Spotify applies them.
+    """
+    kept = _longest_increasing(order)
+    state = list(range(len(order)))
+    moves = []
+    i = 0
+    while i < len(order):
+        if order[i] in kept:
+            i += 1
+            continue
+        start = state.index(order[i])
+        length = 1
+        while (i + length < len(order) and order[i + length] not in kept
+               and start + length < len(state) and state[start + length] == order[i + length]):
+            length += 1
+        insert_before = state.index(order[i - 1]) + 1 if i else 0
+        if not start <= insert_before <= start + length:
+            moving = state[start:start + length]
+            del state[start:start + length]
+            at = insert_before - length if insert_before > start else insert_before
+            state[at:at] = moving
+            moves.append(Reorder(start, length, insert_before))
+        i += length
+    return moves
+
+
+def rewrite_calls(items, batch_size=BATCH_SIZE):
+    """Calls needed to rewrite a playlist as ``items``: one replace, then the adds."""
+    return max(1, -(-len(items) // batch_size))
+
+
+def rewrite_playlist(sp, playlist_id, items, batch_size=BATCH_SIZE):
+    """Set a playlist to ``items``: the first 100 replace its contents, the rest are appended.
+
+    That is ceil(n / 100) writes, one fewer than clearing it and re-adding everything.
+    Local files can't be added through the API, so any the playlist holds
+    are lost; check for them first and reorder such playlists instead.
+    """
+    sp.playlist_replace_items(playlist_id, items[:batch_size])
+    for i in range(batch_size, len(items), batch_size):
+        sp.playlist_add_items(playlist_id, items[i:i + batch_size])
+    return rewrite_calls(items, batch_size)
+
+
+def reorder_playlist(sp, playlist_id, moves):
+    """Apply plan_reorder moves in order; unlike a rewrite this keeps every track's added_at."""
+    for move in moves:
+        sp.playlist_reorder_items(playlist_id, move.range_start, move.insert_before,
+                                  range_length=move.range_length)
+    return len(moves)
@@ -0,0 +1,83 @@
+import json
+from collections import namedtuple
+
+from LibraryStore import DB_FILE, LibraryStore
+
+REGISTRY_FILE = 'playlist_registry.json'
+
+# A registered playlist, with its name as of the last library sync
+Playlist = namedtuple('Playlist', ['id', 'name', 'tags'])
+
+
+class PlaylistRegistry:
+    """The playlists our jobs work on, resolved against the local library store.
+
+    playlist_registry.json lists each playlist by ``id``, ``name`` or both,
+    with ``tags`` saying which jobs use it. A tag like 'sort:Pop' also
+    carries a label, here the genre bucket the playlist holds. Every entry
+    is resolved and validated against the store's playlist listing in one
+    query when the registry is built, so a mistyped or truncated ID fails
+    at startup instead of on the first write, and no job has to page
+    through current_user_playlists to find its playlists.
+    """
+
+    def __init__(self, entries, listing):
+        """``listing`` is {playlist_id: name} for every playlist in the library."""
+        by_name = {}
+        for playlist_id, name in listing.items():
+            by_name.setdefault(name, []).append(playlist_id)
+
+        self.playlists = []
+        problems = []
+        for entry in entries:
+            playlist_id, name = entry.get('id'), entry.get('name')
+            if playlist_id is None:
+                matches = by_name.get(name, [])
+                if len(matches) != 1:
+                    problems.append(f"{len(matches)} playlists are named {name!r}")
+                    continue
+                playlist_id = matches[0]
+            elif playlist_id not in listing:
+                # Usually a copy-paste that lost a character or two
+                close = [known for known in listing if playlist_id in known]
+                hint = f" (did you mean {', '.join(close)}?)" if close else ''
+                problems.append(f"{name or playlist_id!r}: no playlist with ID {playlist_id}{hint}")
+                continue
+            # The ID wins over a stale name, e.g. after a rename
+            self.playlists.append(Playlist(playlist_id, listing[playlist_id], tuple(entry.get('tags', ()))))
+        if problems:
+            raise ValueError("Playlist registry doesn't match the library; fix "
+                             f"{REGISTRY_FILE} or re-run Library_Script.py:\n  " + '\n  '.join(problems))
+
+        self._by_id = {playlist.id: playlist for playlist in self.playlists}
+        self._by_name = {playlist.name: playlist for playlist in self.playlists}
+
+    @classmethod
+    def load(cls, path=REGISTRY_FILE, db_path=DB_FILE):
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+        with LibraryStore(db_path) as store:
+            listing = {playlist_id: snapshot['name'] for playlist_id, snapshot in store.snapshots().items()}
+        if not listing:
+            raise ValueError(f"{db_path} has no playlists yet; run Library_Script.py first")
+        return cls(entries, listing)
+
+    def get(self, name_or_id):
+        """The registered playlist with this ID or name; KeyError if there is none."""
+        playlist = self._by_id.get(name_or_id) or self._by_name.get(name_or_id)
+        if playlist is None:
+            raise KeyError(f"{name_or_id!r} is not in {REGISTRY_FILE}")
+        return playlist
+
+    def tagged(self, tag):
+        """Registered playlists carrying ``tag``, in registry order."""
+        return [playlist for playlist in self.playlists if tag in playlist.tags]
+
+    def labels(self, prefix):
+        """{label: playlist} for every tag of the form 'prefix:label'."""
+        return {tag.split(':', 1)[1]: playlist
+                for playlist in self.playlists for tag in playlist.tags if tag.startswith(prefix + ':')}
+
+    def names(self):
+        """{playlist_id: name} for every registered playlist, e.g. for describe_plan."""
+        return {playlist.id: playlist.name for playlist in self.playlists}
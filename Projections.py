@@ -0,0 +1,35 @@
+from collections import namedtuple
+
+from Pagination import iter_playlist_tracks
+
+# The parts of a playlist item the scripts actually read; artist_id is the first credited artist
+Track = namedtuple('Track', ['id', 'name', 'uri', 'artist_id', 'artist_name', 'artist_ids'], defaults=((),))
+
+# Spotify `fields` filters, one per consumer: only what it reads, plus paging info.
+# Full track objects carry album art, markets, external URLs and so on that none of us use.
+TRACK_ID_FIELDS = 'items(track(id)),next'
+TRACK_NAME_FIELDS = 'items(track(id,name)),next'
+LIBRARY_FIELDS = 'items(track(id,name,album(id),artists(id,name))),next,offset'
+SORTER_FIELDS = 'items(track(id,name,uri,artists(id,name))),next'
+
+
+def parse_track(item):
+    """Compact Track from a playlist item fetched with any filter above.
+
+    Returns None for removed tracks and local files, which have no Spotify ID.
+    """
+    track = item.get('track')
+    if not track or not track.get('id'):
+        return None
+    artists = track.get('artists') or [{}]
+    artist_ids = tuple(artist['id'] for artist in artists if artist.get('id'))
+    return Track(track['id'], track.get('name'), track.get('uri'), artists[0].get('id'), artists[0].get('name'),
+                 artist_ids)
+
+
+def iter_tracks(sp, playlist_id, fields=SORTER_FIELDS, prefetch=True):
+    """Yield a Track for every playable track in a playlist, fetching only ``fields``."""
+    for item in iter_playlist_tracks(sp, playlist_id, fields=fields, prefetch=prefetch):
+        track = parse_track(item)
+        if track:
+            yield track
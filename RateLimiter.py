@@ -0,0 +1,89 @@
+import asyncio
+import os
+import threading
+import time
+
+# Spotify enforces its limit over a rolling 30 second window. The exact budget
+# isn't published, so it's tunable; the default stays comfortably under what
+# our app has been allowed in practice.
+WINDOW_SECONDS = 30
+REQUESTS_PER_WINDOW = int(os.getenv("SPOTIFY_REQUESTS_PER_WINDOW", 150))
+BURST = int(os.getenv("SPOTIFY_BURST", 10))
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every request a job makes.
+
+    Callers take a token before each request and sleep if the bucket is empty,
+    so requests are paced before Spotify has to answer with 429. When a 429
+    does come back, ``penalize`` stops the whole bucket for Retry-After
+    seconds, which pauses every worker at once instead of each retrying alone.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.throttled_seconds = 0.0  # summed over all callers
+        self.rate_limit_hits = 0
+        self.requests = 0
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()  # in the future while paused by a 429
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            self.requests += 1
+            wait = max(0.0, self._updated - now) + max(0.0, -self._tokens) / self.rate
+            self.throttled_seconds += wait
+            return wait
+
+    def pause_remaining(self):
+        with self._lock:
+            return max(0.0, self._updated - time.monotonic())
+
+    def acquire(self):
+        time.sleep(self.reserve())
+        # A 429 seen by another worker while we slept pauses us too
+        remaining = self.pause_remaining()
+        while remaining > 0:
+            with self._lock:
+                self.throttled_seconds += remaining
+            time.sleep(remaining)
+            remaining = self.pause_remaining()
+
+    async def acquire_async(self):
+        # Same as acquire, for callers on an event loop
+        await asyncio.sleep(self.reserve())
+        remaining = self.pause_remaining()
+        while remaining > 0:
+            with self._lock:
+                self.throttled_seconds += remaining
+            await asyncio.sleep(remaining)
+            remaining = self.pause_remaining()
+
+    def penalize(self, retry_after):
+        """Stop handing out tokens for ``retry_after`` seconds after a 429."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate_limit_hits += 1
+            resume_at = now + retry_after
+            if resume_at > self._updated:
+                self._updated = resume_at
+                self._tokens = min(self._tokens, 0.0)
+
+    def report(self):
+        return (f"{self.requests} requests, {self.rate_limit_hits} rate limit responses, "
+                f"{self.throttled_seconds:.1f}s spent throttled")
+
+
+spotify_limiter = TokenBucket(rate=REQUESTS_PER_WINDOW / WINDOW_SECONDS, capacity=BURST)
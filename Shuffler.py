@@ -1,150 +1,100 @@
-import sys
-import spotipy
-# import pyodbc
-import time
 import os
-import random
-import pandas as pd
-from spotipy.oauth2 import SpotifyOAuth
-from dotenv import load_dotenv
+import time
+from concurrent.futures import ThreadPoolExecutor
+from RateLimiter import spotify_limiter
+from SpotifyClient import get_spotify_client
+from Pagination import iter_playlist_tracks
+from Projections import TRACK_ID_FIELDS, parse_track
+from FairShuffle import fair_shuffle
+from LibraryStore import LibraryStore
+from PlaylistRegistry import PlaylistRegistry
+from PlaylistOrder import (DEFAULT_WORKERS, partial_shuffle, plan_reorder, reorder_playlist,
+                          rewrite_calls, rewrite_playlist)
+
+# 'rewrite' replaces each playlist with a full shuffle; 'reorder' moves tracks in place,
+# keeping their added_at dates, and is only worth it for a partial shuffle.
+# Playlists with local files get the full shuffle too, applied as moves, since a rewrite would drop them
+SHUFFLE_MODE = os.getenv("SHUFFLE_MODE", "rewrite")
 
-# Load variables from .env file into the environment
-load_dotenv()
+# Share of each playlist's tracks the 'reorder' mode shuffles among themselves
+SHUFFLE_FRACTION = float(os.getenv("SHUFFLE_FRACTION", 0.1))
 
-# Access the environment variables
-client_id = os.getenv("SPOTIPY_CLIENT_ID")
-client_secret = os.getenv("SPOTIPY_CLIENT_SECRET")
-redirect_uri = os.getenv("SPOTIPY_REDIRECT_URI")
+# Set SHUFFLE_SEED to get the same full shuffle every run, e.g. when testing
+SHUFFLE_SEED = os.getenv("SHUFFLE_SEED")
 
-# Replace 'your_user_id' with your actual Spotify user ID
-user_id = os.getenv("USER_ID")
+# Playlists shuffled at once; override with SHUFFLE_WORKERS
+SHUFFLE_WORKERS = DEFAULT_WORKERS
 
 # Authenticate
-sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=client_id,
-                                               client_secret=client_secret,
-                                               redirect_uri=redirect_uri,
-                                               scope='playlist-read-private playlist-modify-private playlist-modify-public'))
-
-# Fetch the current user's playlists
-playlists = sp.current_user_playlists()
-
-# Display the playlists and their IDs
-# for playlist in playlists['items']:
-#    print(f"Name: {playlist['name']}, ID: {playlist['id']}")
-
-print("All playlists fetched successfully!")
-
-PLAYLIST_DICT = {
-    '2tciVu41abGNGGDTor8ymi': 'Pop jams',
-    '02amPkup87qzafM74GaBio': 'Country',
-    '4lljfJpe1l0IIHghRghBtw': 'Skux Life',
-    '5PocUkbg0I7wy9qBpJkehp': 'Rap',
-    '1R6uRy98QBq8fmq7KY1loJ': 'Classic Chill Rap',
-    '4EvCXZDLdnJfAYUUqAeFp4': 'R&B',
-    '4I93rJXYxrwMOgOrueztzt': 'White Noise Ambient',
-    '5artPRbCYgZHoWmkaS1Qwo': 'New R&B',
-    '3s7zMU3AEY6clhnHXl54Cq': 'Rock - Retirement',
-    '5PBj2MCDvGlmxFFJJMyDDl': 'Country - Retirement',
-    '6jZlLmmY9Brko7ohKPIghE': 'EDM - Retirement',
-    '1vRyUUQuoK1bgERMI15bZM': 'Rap - Retirement',
-    '4Dn82KRwRl79HwCibPCg3g': 'Baby Driver',
-    '4InvgPgwdpYWdxDvTAGXx6': 'Meditation Music',
-    '0mXPvAzrlEBUfshpde5Xll': 'Relaxing Baby Music',
-    '2ng5uPHZ44mCTRfmCqMQl2': 'Work Jams',
-    '48xx6foIN9FRJAAIBnrnFo': 'Full Focus',
-    '0HhSRNnQX0UctzwaDPoRnz': 'Shower Karaoke',
-    '7xULdcgCdm4QM4D4OJQqgj': 'Gym',
-    '2R0mnMr78Nku1v6PwRsjBW': 'Holiday Tunes',
-    '7iyW4cHp6CvMRwBpt4b7Pr': 'Spooky Tunes',
-    '2g9mZeeETYX5YPvnsccSIT': '.think',
-    '5RAagXBkK2HpyKVX4ZuNkJ': 'It\'s a good day',
-    '6aFoEzi4P7xma7TuzyXlud': 'Summer Jams',
-    '2UMzHLkmlkVfCjMeZWE1Ss': 'Rainy Days',
-    '5iL9YJwiEil0ebEzCmACXg': 'Classic Rock / BBQ Music',
-    '25Cz82cEBT50PxqprN5B1a': 'Desert Road',
-    '6lpW8iDy95jCWX976Ujr7P': 'Late Nights',
-    '5MxlRcAT7NS0YZAbkHwTrZ': 'Chillin',
-    '1eZrPoXiEaIs1ZVDgx9JQM': 'Nights At the Roxbury',
-    '1AMZ0uS8KoxPRPqGHuzGhE': 'Devil\'s Lettuce',
-    '4uxk9ZYpyL4Uqxw9jTKm82': 'alt',
-    '44okKoHjUXErp3wXowRUDx': '2000s bops',
-    '3n6jvXn4Av8h6p9l5HolIO': '90s // Classic R&B',
-    '4dCrVJEWn25z1tnEDpcfTs': '50s / 60s'
-}
-
-PLAYLIST_IDS = ['2tciVu41abGNGGDTor8ymi', # Pop jams
-                '02amPkup87qzafM74GaBio', # Country
-                '4lljfJpe1l0IIHghRghBtw', # Skux Life
-                '5PocUkbg0I7wy9qBpJkehp', # Rap
-                '1R6uRy98QBq8fmq7KY1loJ', # Classic Chill Rap
-                '4EvCXZDLdnJfAYUUqAeFp4', # R&B
-                '4I93rJXYxrwMOgOrueztzt', # White Noise Ambient
-                '5artPRbCYgZHoWmkaS1Qwo', # New R&B
-                '4Dn82KRwRl79HwCibPCg3g', # Baby Driver
-                '4InvgPgwdpYWdxDvTAGXx6', # Meditation Music
-                '0mXPvAzrlEBUfshpde5Xll', # Relaxing Baby Music
-                '2ng5uPHZ44mCTRfmCqMQl2', # Work Jams
-                '48xx6foIN9FRJAAIBnrnFo', # Full Focus
-                '0HhSRNnQX0UctzwaDPoRnz', # Shower Karaoke
-                '7xULdcgCdm4QM4D4OJQqgj', # Gym
-                '2R0mnMr78Nku1v6PwRsjBW', # Holiday Tunes
-                '7iyW4cHp6CvMRwBpt4b7Pr', # Spooky Tunes
-                '2g9mZeeETYX5YPvnsccSIT', # .think
-                '5RAagXBkK2HpyKVX4ZuNkJ', # It's a good day
-                '6aFoEzi4P7xma7TuzyXlud', # Summer Jams
-                '2UMzHLkmlkVfCjMeZWE1Ss', # Rainy Days
-                '5iL9YJwiEil0ebEzCmACXg', # Classic Rock / BBQ Music
-                '25Cz82cEBT50PxqprN5B1a', # Desert Road
-                '6lpW8iDy95jCWX976Ujr7P', # Late Nights
-                '5MxlRcAT7NS0YZAbkHwTrZ', # Chillin
-                '1eZrPoXiEaIs1ZVDgx9JQM', # Nights At the roxbury
-                '1AMZ0uS8KoxPRPqGHuzGhE', # Devil's Lettuce
-                '4uxk9ZYpyL4Uqxw9jTKm82', # alt
-                '44okKoHjUXErp3wXowRUDx', # 2000s bops
-                '3n6jvXn4Av8h6p9l5HolIO', # 90s // Classic R&B 
-                '4dCrVJEWn25z1tnEDpcfTs'] # 50s / 60s
-                
-
-def rate_limited_request(func, *args, **kwargs):
-    while True:
-        try:
-            return func(*args, **kwargs)
-        except spotipy.exceptions.SpotifyException as e:
-            if e.http_status == 429:
-                retry_after = int(e.headers.get("Retry-After", 1))
-                print(f"Rate limit exceeded. Retrying in {retry_after} seconds...")
-                time.sleep(retry_after)
-            else:
-                raise
-
-def get_playlist_tracks(playlist_id):
-    tracks = []
-    results = rate_limited_request(sp.playlist_tracks, playlist_id)
-    
-    while results:
-        for item in results.get('items', []):
-            track = item.get('track')
-            if track:
-                tracks.append(track['id'])
-        results = rate_limited_request(sp.next, results) if results.get('next') else None
-    
-    return tracks
-                
-for PLAYLIST_ID in PLAYLIST_IDS:
-    # Fetch all the tracks from the playlist
-    tracks = get_playlist_tracks(PLAYLIST_ID)
-    
-    # Shuffle the tracks
-    random.shuffle(tracks)
-    
-    # Clear the current playlist
-    rate_limited_request(sp.playlist_replace_items, PLAYLIST_ID, [])
-    
-    # Add the shuffled tracks to the playlist in chunks of 100
-    for i in range(0, len(tracks), 100):
-        rate_limited_request(sp.playlist_add_items, PLAYLIST_ID, tracks[i:i + 100])
-    
-    print(f"{PLAYLIST_DICT[PLAYLIST_ID]} shuffled successfully!")
+sp = get_spotify_client(scope='playlist-read-private playlist-modify-private playlist-modify-public',
+                        pool_size=SHUFFLE_WORKERS)
+
+# The playlists to shuffle are the ones tagged 'shuffle' in playlist_registry.json
+registry = PlaylistRegistry.load()
+shuffle_playlists = registry.tagged('shuffle')
+print(f"{len(shuffle_playlists)} playlists to shuffle")
+
+
+def get_playlist_items(playlist_id):
+    # Only track IDs are needed to reshuffle, so that's all we ask Spotify for
+    return list(iter_playlist_tracks(sp, playlist_id, fields=TRACK_ID_FIELDS))
+
+
+# Artist key for local files and unavailable tracks, which are spread through the shuffle as one group
+UNWRITABLE = object()
+
+
+def reorder_shuffle(playlist_id, total):
+    # Reordering works on positions, local files included, so only the length is needed.
+    # Move only the shuffled tracks, with as few range moves as possible
+    order = partial_shuffle(range(total), SHUFFLE_FRACTION)
+    return reorder_playlist(sp, playlist_id, plan_reorder(order))
+
+
+def fair_order(playlist_id, track_ids):
+    """Current positions in fair-shuffled order; ``track_ids`` has None for local and unavailable tracks."""
+    # Artists and albums come from the last library crawl; tracks it hasn't seen are spread as one group
+    with LibraryStore() as store:
+        metadata = store.track_metadata([track_id for track_id in track_ids if track_id])
+
+    def artist(position):
+        track_id = track_ids[position]
+        return metadata.get(track_id, (None, None))[0] if track_id else UNWRITABLE
+
+    return fair_shuffle(range(len(track_ids)), artist=artist,
+                        album=lambda position: metadata.get(track_ids[position], (None, None))[1],
+                        seed=None if SHUFFLE_SEED is None else f"{SHUFFLE_SEED}:{playlist_id}")
+
+
+def shuffle_playlist(playlist):
+    playlist_id = playlist.id
+    if SHUFFLE_MODE == 'reorder':
+        total = sp.playlist(playlist_id, fields='tracks.total')['tracks']['total']
+        calls = reorder_shuffle(playlist_id, total)
+    else:
+        # Fetch all the tracks from the playlist, shuffle them and write them back over the old order
+        track_ids = [track.id if track else None for track in map(parse_track, get_playlist_items(playlist_id))]
+        total = len(track_ids)
+        order = fair_order(playlist_id, track_ids)
+        unwritable = track_ids.count(None)
+        if unwritable:
+            # Local files and unavailable tracks can't be written back through the API, so a
+            # rewrite would delete them; apply the same full shuffle by moving tracks in place
+            calls = reorder_playlist(sp, playlist_id, plan_reorder(order))
+            print(f"{playlist.name} has {unwritable} local or unavailable tracks; "
+                  f"moved tracks in place instead of rewriting, {calls} writes instead of {rewrite_calls(order)}")
+        else:
+            calls = rewrite_playlist(sp, playlist_id, [track_ids[position] for position in order])
+
+    print(f"{playlist.name} shuffled successfully! ({total} tracks, {calls} writes)")
+    return calls
+
+
+start = time.perf_counter()
+with ThreadPoolExecutor(max_workers=SHUFFLE_WORKERS) as executor:
+    writes = sum(executor.map(shuffle_playlist, shuffle_playlists))
 
 print('------------------------------------------------------------')
-print('ALL DONE!')
+print(f"ALL DONE! {len(shuffle_playlists)} playlists, {writes} writes in {time.perf_counter() - start:.1f}s")
+print(f"Rate limiter: {spotify_limiter.report()}")
+
@@ -14,77 +14,39 @@
 # ---
 
 # %%
-import spotipy
-import pyodbc
-import time
-import os
 import pandas as pd
-from spotipy.oauth2 import SpotifyOAuth
-from dotenv import load_dotenv
+from RateLimiter import spotify_limiter
+from SpotifyClient import get_spotify_client
+from AsyncSpotify import get_async_spotify_client, run_async
 
-# Load variables from .env file into the environment
-load_dotenv()
-
-# Access the environment variables
-client_id = os.getenv("SPOTIPY_CLIENT_ID")
-client_secret = os.getenv("SPOTIPY_CLIENT_SECRET")
-redirect_uri = os.getenv("SPOTIPY_REDIRECT_URI")
-
-# Replace 'your_user_id' with your actual Spotify user ID
-user_id = os.getenv("USER_ID")
+SCOPE = 'user-library-read playlist-modify-private'
 
 # Authenticate
-sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=client_id,
-                                               client_secret=client_secret,
-                                               redirect_uri=redirect_uri,
-                                               scope='user-library-read playlist-modify-private'))
-
-# %%
-import os
-
-# Remove the cached token file
-if os.path.exists('.cache'):
-    os.remove('.cache')
-
-
-# %%
-def rate_limited_request(func, *args, **kwargs):
-    while True:
-        try:
-            return func(*args, **kwargs)
-        except spotipy.exceptions.SpotifyException as e:
-            if e.http_status == 429:
-                retry_after = int(e.headers.get("Retry-After", 1))
-                print(f"Rate limit exceeded. Retrying in {retry_after} seconds...")
-                time.sleep(retry_after)
-            else:
-                raise
+sp = get_spotify_client(scope=SCOPE)
 
 
 # %%
 # Initialize a list to hold all episode data
 episodes_data = []
 
-# Get episodes from "Your Episodes" (saved episodes)
-results = sp.current_user_saved_episodes()
-
-while results:
-    for item in results['items']:
-        episode = item['episode']
-        episode_id = episode['id']
-        episode_name = episode['name']
-        show_name = episode['show']['name']
-        duration_ms = episode['duration_ms']  # Duration in milliseconds
-        
-        episodes_data.append({
-            'episode_name': episode_name,
-            'show_name': show_name,
-            'duration_ms': duration_ms,
-            'episode_id': episode_id
-        })
-    
-    # Pagination - Get next batch of episodes
-    results = sp.next(results) if results['next'] else None
+# Get episodes from "Your Episodes" (saved episodes), requesting every page at once
+async def fetch_saved_episodes():
+    async with get_async_spotify_client(SCOPE) as client:
+        return await client.all_saved_episodes()
+
+for item in run_async(fetch_saved_episodes()):
+    episode = item['episode']
+    episode_id = episode['id']
+    episode_name = episode['name']
+    show_name = episode['show']['name']
+    duration_ms = episode['duration_ms']  # Duration in milliseconds
+
+    episodes_data.append({
+        'episode_name': episode_name,
+        'show_name': show_name,
+        'duration_ms': duration_ms,
+        'episode_id': episode_id
+    })
 
 # Convert list to DataFrame
 df = pd.DataFrame(episodes_data)
@@ -112,3 +74,4 @@ for i in range(0, len(episode_ids), chunk_size):
     sp.playlist_add_items(playlist_id, episode_ids[i:i+chunk_size])
 
 print(f"Added {len(episode_ids)} episodes to the playlist '{playlist_name}'.")
+print(f"Rate limiter: {spotify_limiter.report()}")
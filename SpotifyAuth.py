@@ -0,0 +1,89 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from spotipy.cache_handler import CacheFileHandler
+from spotipy.oauth2 import SpotifyOAuth
+
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl, so we only lock between threads there
+    fcntl = None
+
+# Refresh the access token this many seconds before Spotify says it expires
+REFRESH_MARGIN_SECONDS = 120
+
+
+def token_cache_path(scope):
+    # One cache file per scope set, so the history job and the library job
+    # never hand each other a token that is missing the scopes they need
+    scopes = sorted(set(scope.split())) if scope else ['default']
+    return '.cache-headless-' + '+'.join(scopes)
+
+
+class LockedCacheFileHandler(CacheFileHandler):
+    """Token cache file that can be held under an exclusive lock.
+
+    The cron jobs in run_spotify_*.sh can overlap, so the check-then-refresh
+    in HeadlessSpotifyAuth is done while holding a lock on ``<cache>.lock``.
+    """
+
+    def __init__(self, cache_path, **kwargs):
+        super().__init__(cache_path=cache_path, **kwargs)
+        self.lock_path = cache_path + '.lock'
+
+    @contextmanager
+    def locked(self):
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class HeadlessSpotifyAuth(SpotifyOAuth):
+    """SpotifyOAuth that never prompts, driven by a stored refresh token.
+
+    The access token is kept in memory along with its expiry and is only
+    refreshed when it is about to expire. Refreshed tokens are written to a
+    shared cache file so other threads and other jobs reuse them instead of
+    refreshing on every API call.
+    """
+
+    def __init__(self, refresh_token, *args, refresh_margin=REFRESH_MARGIN_SECONDS, **kwargs):
+        if kwargs.get('cache_handler') is None:
+            kwargs['cache_handler'] = LockedCacheFileHandler(token_cache_path(kwargs.get('scope')))
+        super().__init__(*args, **kwargs)
+        self.refresh_token_value = refresh_token
+        self.refresh_margin = refresh_margin
+        self.refresh_count = 0
+        self._token_info = None
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, token_info):
+        return bool(token_info) and token_info['expires_at'] - time.time() > self.refresh_margin
+
+    def get_access_token(self, code=None, as_dict=True, check_cache=True):
+        with self._lock:
+            if not self._is_fresh(self._token_info):
+                self._token_info = self._load_or_refresh_token()
+            token_info = self._token_info
+        return token_info if as_dict else token_info['access_token']
+
+    def _load_or_refresh_token(self):
+        handler = self.cache_handler
+        lock = handler.locked() if isinstance(handler, LockedCacheFileHandler) else nullcontext()
+        with lock:
+            # Another thread or job may have refreshed while we waited for the lock
+            token_info = handler.get_cached_token()
+            if self._is_fresh(token_info):
+                return token_info
+
+            # refresh_access_token also saves the new token to the cache handler
+            token_info = self.refresh_access_token(self.refresh_token_value)
+            self.refresh_token_value = token_info['refresh_token']
+            self.refresh_count += 1
+            return token_info
@@ -0,0 +1,122 @@
+import os
+
+import requests
+import spotipy
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from spotipy.oauth2 import SpotifyOAuth
+from urllib3.util.retry import Retry
+
+from RateLimiter import spotify_limiter
+from SpotifyAuth import HeadlessSpotifyAuth
+
+# Keep-alive connections kept open per host; raise it for jobs that run many threads
+DEFAULT_POOL_SIZE = int(os.getenv("SPOTIFY_POOL_SIZE", 10))
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = 10
+MAX_RATE_LIMIT_RETRIES = 5
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter that paces every request through a shared TokenBucket.
+
+    429 responses are retried here rather than by urllib3, so Retry-After
+    pauses the shared bucket (and with it every other worker) instead of
+    only the request that hit it.
+    """
+
+    def __init__(self, limiter, max_rate_limit_retries=MAX_RATE_LIMIT_RETRIES, **kwargs):
+        super().__init__(**kwargs)
+        self.limiter = limiter
+        self.max_rate_limit_retries = max_rate_limit_retries
+
+    def send(self, request, **kwargs):
+        for attempt in range(self.max_rate_limit_retries + 1):
+            self.limiter.acquire()
+            response = super().send(request, **kwargs)
+            if response.status_code != 429 or attempt == self.max_rate_limit_retries:
+                return response
+            retry_after = int(response.headers.get("Retry-After", 1))
+            print(f"Rate limit exceeded. Pausing all requests for {retry_after} seconds... "
+                  f"(Attempt {attempt + 1} of {self.max_rate_limit_retries})")
+            self.limiter.penalize(retry_after)
+            response.close()
+
+
+def build_session(pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, limiter=spotify_limiter):
+    """Build a requests session that reuses TCP/TLS connections and retries transient errors.
+
+    Pass ``limiter=None`` to skip rate limiting, e.g. against a local stub server.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+        status=retries,
+        backoff_factor=0.3,
+        status_forcelist=(500, 502, 503, 504),
+        # 429s are left to RateLimitedAdapter so the pause is shared
+        respect_retry_after_header=False)
+
+    adapter_kwargs = dict(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    if limiter is None:
+        adapter = HTTPAdapter(**adapter_kwargs)
+    else:
+        adapter = RateLimitedAdapter(limiter, **adapter_kwargs)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_refresh_token(scope):
+    """Return the refresh token for ``scope``, asking the user to log in once if none is cached."""
+    load_dotenv()
+    sp_oauth = SpotifyOAuth(
+        client_id=os.getenv("SPOTIPY_CLIENT_ID"),
+        client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
+        redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
+        scope=scope
+    )
+
+    token_info = sp_oauth.get_cached_token()
+    if not token_info:
+        auth_url = sp_oauth.get_authorize_url()
+        print(f"Go to this URL to authorize: {auth_url}")
+        response = input("Paste the URL you were redirected to: ")
+
+        code = sp_oauth.parse_response_code(response)
+        token_info = sp_oauth.get_access_token(code)
+
+    return token_info['refresh_token']
+
+
+def get_auth_manager(scope, session=None, requests_timeout=DEFAULT_TIMEOUT):
+    """Build a HeadlessSpotifyAuth for ``scope`` from the cached refresh token."""
+    load_dotenv()
+    return HeadlessSpotifyAuth(
+        client_id=os.getenv("SPOTIPY_CLIENT_ID"),
+        client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
+        redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
+        refresh_token=get_refresh_token(scope),
+        scope=scope,
+        requests_session=session if session is not None else True,
+        requests_timeout=requests_timeout
+    )
+
+
+def get_spotify_client(scope, session=None, pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES,
+                       requests_timeout=DEFAULT_TIMEOUT):
+    """Build the one spotipy client a job needs.
+
+    The client and its auth manager share a single pooled session, so token
+    refreshes and API calls all go over the same keep-alive connections.
+    """
+    if session is None:
+        session = build_session(pool_size=pool_size, retries=retries)
+
+    auth_manager = get_auth_manager(scope, session=session, requests_timeout=requests_timeout)
+    return spotipy.Spotify(auth_manager=auth_manager,
+                           requests_session=session,
+                           requests_timeout=requests_timeout)
@@ -0,0 +1,63 @@
+"""Benchmark the AsyncSpotify engine against the in-process fake Spotify app.
+
+Crawls every playlist of benchmarks.fake_spotify.FakeSpotify twice: once
+one page at a time (what Library_Script.py used to do) and once fanned out
+on a single event loop. Run from the repo root:
+
+    python -m benchmarks.bench_async_engine --latency 0.05 --concurrency 32
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from AsyncSpotify import AsyncSpotify
+from benchmarks.fake_spotify import FakeSpotify
+
+
+async def crawl_sequential(client, playlist_ids):
+    items = []
+    for playlist_id in playlist_ids:
+        async for item in client.iter_items(await client.playlist_tracks(playlist_id)):
+            items.append(item)
+    return items
+
+
+async def crawl_fanned_out(client, playlist_ids):
+    results = await asyncio.gather(*(client.all_playlist_tracks(playlist_id) for playlist_id in playlist_ids))
+    return [item for items in results for item in items]
+
+
+async def run(crawl, app, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    async with AsyncSpotify(base_url='http://fake-spotify/v1/', transport=transport,
+                            concurrency=concurrency, limiter=None) as client:
+        requests_before = app.requests
+        start = time.perf_counter()
+        items = await crawl(client, list(app.playlists))
+        elapsed = time.perf_counter() - start
+    return items, app.requests - requests_before, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--playlists', type=int, default=40)
+    parser.add_argument('--tracks', type=int, default=600, help='tracks per playlist')
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated seconds per request')
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    app = FakeSpotify(playlists=args.playlists, tracks_per_playlist=args.tracks, latency=args.latency)
+    sequential, seq_requests, seq_elapsed = asyncio.run(run(crawl_sequential, app, 1))
+    fanned_out, fan_requests, fan_elapsed = asyncio.run(run(crawl_fanned_out, app, args.concurrency))
+    assert sequential == fanned_out
+
+    print(f"{args.playlists} playlists x {args.tracks} tracks, {args.latency * 1000:.0f} ms simulated latency")
+    print(f"  sequential:         {seq_requests} requests in {seq_elapsed:6.2f}s ({seq_requests / seq_elapsed:7.1f} req/s)")
+    print(f"  fanned out (c={args.concurrency:<3}): {fan_requests} requests in {fan_elapsed:6.2f}s "
+          f"({fan_requests / fan_elapsed:7.1f} req/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark FairShuffle.fair_shuffle against random.shuffle on a large, artist-heavy playlist.
+
+Builds --tracks synthetic tracks whose artists follow a long tail, as in
+'Pop jams' or 'Rap', each artist with a few albums, then times both
+shuffles and counts how often the same artist or album plays back to
+back. Run from the repo root:
+
+    python -m benchmarks.bench_fair_shuffle --tracks 10000
+"""
+import argparse
+import random
+import time
+from collections import namedtuple
+
+from FairShuffle import adjacent_repeats, fair_shuffle
+
+Track = namedtuple('Track', ['id', 'artist_id', 'album_id'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tracks', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=800)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # A few artists account for most of the tracks
+    weights = [1 / (rank + 1) for rank in range(args.artists)]
+    artists = rng.choices(range(args.artists), weights=weights, k=args.tracks)
+    tracks = [Track(f'track{t}', f'artist{a}', f'album{a}-{rng.randrange(4)}') for t, a in enumerate(artists)]
+    artist = lambda track: track.artist_id
+    album = lambda track: track.album_id
+
+    start = time.perf_counter()
+    shuffled = list(tracks)
+    random.Random(args.seed).shuffle(shuffled)
+    random_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fair = fair_shuffle(tracks, artist, album, seed=args.seed)
+    fair_elapsed = time.perf_counter() - start
+
+    assert fair == fair_shuffle(tracks, artist, album, seed=args.seed)
+    assert sorted(fair) == sorted(tracks)
+
+    top_artist_share = max(artists.count(a) for a in set(artists)) / args.tracks
+    print(f"{args.tracks} tracks by {len(set(artists))} artists (top artist {top_artist_share:.0%} of the playlist)")
+    print(f"  random.shuffle: {random_elapsed * 1000:6.1f} ms, "
+          f"{adjacent_repeats(shuffled, artist)} artist / {adjacent_repeats(shuffled, album)} album repeats")
+    print(f"  fair_shuffle:   {fair_elapsed * 1000:6.1f} ms, "
+          f"{adjacent_repeats(fair, artist)} artist / {adjacent_repeats(fair, album)} album repeats")
+
+
+if __name__ == '__main__':
+    main()
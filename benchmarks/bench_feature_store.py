@@ -0,0 +1,59 @@
+"""Benchmark opening FeatureStore and looking up a playlist's worth of audio features.
+
+Fills a store in a temporary directory with --tracks synthetic feature
+vectors, then times opening it and fetching --lookups of them, with every
+track already stored so no request is made. Run from the repo root:
+
+    python -m benchmarks.bench_feature_store --tracks 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from FeatureStore import FEATURE_COLUMNS, FeatureStore, valid_rows
+
+
+class NoRequests:
+    def audio_features(self, track_ids):
+        raise AssertionError(f"asked Spotify for {len(track_ids)} stored tracks")
+
+
+def track_id(n):
+    return f'{n:022d}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tracks', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = os.path.join(tmp, 'features.npy'), os.path.join(tmp, 'ids.npy')
+        features = {track_id(n): None if n % 50 == 0 else {column: rng.random() for column in FEATURE_COLUMNS}
+                    for n in range(args.tracks)}
+        start = time.perf_counter()
+        FeatureStore(*paths).add(features)
+        write_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = FeatureStore(*paths)
+        open_elapsed = time.perf_counter() - start
+
+        wanted = [track_id(rng.randrange(args.tracks)) for _ in range(args.lookups)]
+        start = time.perf_counter()
+        matrix = store.fetch(NoRequests(), wanted)
+        lookup_elapsed = time.perf_counter() - start
+
+    print(f"{len(store)} stored tracks (written in {write_elapsed * 1000:.0f} ms)")
+    print(f"  open:   {open_elapsed * 1000:6.2f} ms")
+    print(f"  lookup: {lookup_elapsed * 1000:6.2f} ms for {args.lookups} tracks, "
+          f"{valid_rows(matrix).sum()} with features")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark GenreIndex against the nested loops the genre sorters used to run.
+
+Resolves every genre in unmapped_genres.txt plus every genre in
+genre_mapping.json, once per round, with each approach. Run from the repo
+root:
+
+    python -m benchmarks.bench_genre_index --rounds 200
+"""
+import argparse
+import ast
+import json
+import time
+
+from GenreIndex import GENRE_MAPPING_FILE, GenreIndex
+
+
+def resolve_nested(genre_mapping, genre):
+    # What the sorters did for each artist genre: scan every list, last match wins
+    genre = genre.capitalize()
+    matching_key = None
+    for key, genre_list in genre_mapping.items():
+        for value in genre_list:
+            if value == genre:
+                matching_key = key
+    return matching_key
+
+
+def timed(resolve, genres, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        results = [resolve(genre) for genre in genres]
+    return results, (time.perf_counter() - start) / (rounds * len(genres))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--unmapped', default='unmapped_genres.txt')
+    args = parser.parse_args()
+
+    with open(args.unmapped, encoding='utf-8') as f:
+        unmapped = sorted(ast.literal_eval(f.read()))
+    with open(GENRE_MAPPING_FILE, encoding='utf-8') as f:
+        genre_mapping = json.load(f)
+    mapped = [genre.casefold() for genres in genre_mapping.values() for genre in genres]
+    genres = unmapped + mapped
+
+    build_start = time.perf_counter()
+    index = GenreIndex(genre_mapping)
+    build_elapsed = time.perf_counter() - build_start
+
+    nested, nested_per_genre = timed(lambda genre: resolve_nested(genre_mapping, genre), genres, args.rounds)
+    indexed, indexed_per_genre = timed(index.resolve, genres, args.rounds)
+
+    disagreements = [(genre, old, new) for genre, old, new in zip(genres, nested, indexed) if old != new]
+    print(f"{len(unmapped)} unmapped + {len(mapped)} mapped genres, {len(index.index)} distinct index entries "
+          f"(built in {build_elapsed * 1000:.2f} ms)")
+    print(f"  nested loops: {nested_per_genre * 1e6:8.2f} us per genre")
+    print(f"  GenreIndex:   {indexed_per_genre * 1e6:8.2f} us per genre "
+          f"({nested_per_genre / indexed_per_genre:,.0f}x faster)")
+    print(f"  resolved differently: {len(disagreements)}")
+    for genre, old, new in disagreements:
+        print(f"    {genre!r}: {old} -> {new}")
+
+
+if __name__ == '__main__':
+    main()
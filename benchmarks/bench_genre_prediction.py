@@ -0,0 +1,73 @@
+"""Benchmark whole-playlist genre prediction against predicting 100 tracks at a time.
+
+Trains GenreModel on TLT_genres.csv, fills a temporary FeatureStore with
+--tracks rows from it (every --missing-every'th track without features),
+then times the old per-100 loop (a DataFrame and a predict call per
+batch, None rows filtered out) and predict_tracks (one masked matrix,
+one predict call). Also counts how many tracks the old loop labelled
+with another track's prediction. Run from the repo root:
+
+    python -m benchmarks.bench_genre_prediction --tracks 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from FeatureStore import FEATURE_COLUMNS, FeatureStore, valid_rows
+from GenreModel import TRAINING_CSV, predict_tracks, train_from_csv
+
+
+class NoRequests:
+    def audio_features(self, track_ids):
+        raise AssertionError(f"asked Spotify for {len(track_ids)} stored tracks")
+
+
+def predict_per_batch(model, feature_store, track_ids):
+    # What move_songs_to_genre_playlists did: predict each 100, pair predictions with the unfiltered IDs
+    genres = {}
+    for i in range(0, len(track_ids), 100):
+        batch_ids = track_ids[i:i + 100]
+        features_batch = feature_store.get(batch_ids)
+        features_batch = [row for row, valid in zip(features_batch.tolist(), valid_rows(features_batch)) if valid]
+        features_df = pd.DataFrame(features_batch, columns=FEATURE_COLUMNS)
+        predictions = model.classifier.predict(features_df.to_numpy()) if len(features_df) else []
+        for idx, code in enumerate(predictions):
+            genres[batch_ids[idx]] = model.label_encoder.classes_[code]
+    return genres
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tracks', type=int, default=5000)
+    parser.add_argument('--missing-every', type=int, default=40)
+    args = parser.parse_args()
+
+    model = train_from_csv()
+    rows = pd.read_csv(TRAINING_CSV)[FEATURE_COLUMNS].to_numpy()
+    track_ids = [f'track{n:017d}' for n in range(args.tracks)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FeatureStore(os.path.join(tmp, 'features.npy'), os.path.join(tmp, 'ids.npy'))
+        store.add({track_id: None if n % args.missing_every == 0 else
+                   dict(zip(FEATURE_COLUMNS, rows[n % len(rows)])) for n, track_id in enumerate(track_ids)})
+
+        start = time.perf_counter()
+        old = predict_per_batch(model, store, track_ids)
+        old_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = predict_tracks(model, store, NoRequests(), track_ids)
+        new_elapsed = time.perf_counter() - start
+
+    # A track's own prediction doesn't depend on its batch, so any difference is a shifted label
+    wrong = sum(1 for track_id, genre in old.items() if new.get(track_id) != genre)
+    print(f"{args.tracks} tracks, {len(new)} with features")
+    print(f"  per 100 tracks: {old_elapsed * 1000:7.1f} ms, {wrong} tracks given the wrong prediction")
+    print(f"  whole playlist: {new_elapsed * 1000:7.1f} ms ({old_elapsed / new_elapsed:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
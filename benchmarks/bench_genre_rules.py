@@ -0,0 +1,74 @@
+"""Benchmark GenreRules on genres nobody has listed in genre_mapping.json.
+
+Two inputs: every genre in unmapped_genres.txt, and a synthetic set built
+by moving each listed multi-word genre to a new scene ('Atlanta indie' ->
+'Oslo indie'), whose expected bucket is the original's. Reports how many
+stay unresolved (and so land in Other) with GenreIndex alone and with
+GenreRules, how often the rules agree with the expected bucket, and the
+time per genre. Run from the repo root:
+
+    python -m benchmarks.bench_genre_rules
+"""
+import argparse
+import ast
+import time
+
+from GenreIndex import GenreIndex
+from GenreRules import GenreRules, tokenize
+
+SCENES = ['oslo', 'lagos', 'quito', 'leeds', 'osaka', 'tucson', 'cork', 'lyon', 'kyiv', 'hobart']
+
+
+def novel_genres(genre_index):
+    """{novel genre: expected bucket} for every listed genre of two or more words."""
+    novel = {}
+    for genre, bucket in genre_index.index.items():
+        tokens = tokenize(genre)
+        if len(tokens) < 2:
+            continue
+        for scene in SCENES:
+            candidate = ' '.join([scene, *tokens[1:]])
+            if genre_index.resolve(candidate) is None:
+                novel.setdefault(candidate, bucket)
+    return novel
+
+
+def timed(resolve, genres, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        results = [resolve(genre) for genre in genres]
+    return results, (time.perf_counter() - start) / (rounds * len(genres))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--unmapped', default='unmapped_genres.txt')
+    args = parser.parse_args()
+
+    genre_index = GenreIndex.load()
+    build_start = time.perf_counter()
+    rules = GenreRules.load(genre_index=genre_index)
+    build_elapsed = time.perf_counter() - build_start
+    print(f"Compiled {len(rules.rules)} rules and {len(rules.token_weights)} token weights "
+          f"in {build_elapsed * 1000:.2f} ms")
+
+    with open(args.unmapped, encoding='utf-8') as f:
+        unmapped = sorted(ast.literal_eval(f.read()))
+    novel = novel_genres(genre_index)
+
+    for name, genres in [('unmapped_genres.txt', unmapped), ('novel scenes', list(novel))]:
+        indexed, _ = timed(genre_index.resolve, genres, 1)
+        resolved, per_genre = timed(rules.resolve, genres, args.rounds)
+        print(f"{name}: {len(genres)} genres, {per_genre * 1e6:.2f} us per genre")
+        print(f"  unresolved: GenreIndex {sum(bucket is None for bucket in indexed)}, "
+              f"GenreRules {sum(bucket is None for bucket in resolved)}")
+        if name == 'novel scenes':
+            matched = [(genre, bucket) for genre, bucket in zip(genres, resolved) if bucket is not None]
+            agree = sum(novel[genre] == bucket for genre, bucket in matched)
+            print(f"  agreed with the original genre's bucket: {agree} of {len(matched)} classified "
+                  f"({agree / len(matched):.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark GenreVoting.vote on a large playlist with artist metadata already cached.
+
+Builds --tracks synthetic tracks credited to one to three artists, each
+artist carrying a handful of genres drawn from genre_mapping.json and
+unmapped_genres.txt, then times voting the whole playlist through
+GenreRules. Run from the repo root:
+
+    python -m benchmarks.bench_genre_voting --tracks 10000
+"""
+import argparse
+import ast
+import json
+import random
+import time
+
+from GenreIndex import GENRE_MAPPING_FILE
+from GenreRules import GenreRules
+from GenreVoting import vote
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tracks', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with open(GENRE_MAPPING_FILE, encoding='utf-8') as f:
+        genres = [genre.casefold() for listed in json.load(f).values() for genre in listed]
+    with open('unmapped_genres.txt', encoding='utf-8') as f:
+        genres += [genre.casefold() for genre in sorted(ast.literal_eval(f.read()))]
+    artists = {f'artist{a}': {'genres': rng.sample(genres, rng.randint(0, 6))} for a in range(args.artists)}
+    artist_ids = list(artists)
+    tracks = [rng.sample(artist_ids, rng.choice([1, 1, 1, 2, 3])) for _ in range(args.tracks)]
+
+    rules = GenreRules.load()
+    start = time.perf_counter()
+    track_genres = [[genre for artist_id in credited for genre in artists[artist_id]['genres']] for credited in tracks]
+    buckets, confidence = vote(track_genres, rules.genre_index, resolve=rules.resolve)
+    elapsed = time.perf_counter() - start
+
+    again, _ = vote(track_genres, rules.genre_index, resolve=rules.resolve)
+    assert again == buckets
+
+    print(f"{args.tracks} tracks, {sum(map(len, track_genres))} genre votes: {elapsed * 1000:.1f} ms")
+    print(f"  median confidence {sorted(confidence)[len(confidence) // 2]:.0%}")
+    for bucket in rules.genre_index.buckets:
+        print(f"  {bucket:8} {buckets.count(bucket)}")
+
+
+if __name__ == '__main__':
+    main()
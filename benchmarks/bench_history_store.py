@@ -0,0 +1,83 @@
+"""Benchmark one History_Script.py run against a long synthetic listening history.
+
+Builds a history of --plays plays, then times appending one run's worth of
+recently played items (50, half of them already stored) two ways: the old
+read-concat-dedupe-sort-rewrite of listening_history.csv, and an insert into
+HistoryStore. Run from the repo root:
+
+    python -m benchmarks.bench_history_store --plays 5000000
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from HistoryStore import HistoryStore
+
+START = datetime.datetime(2015, 1, 1)
+SECONDS_BETWEEN_PLAYS = 180
+
+
+def play(n):
+    played_at = START + datetime.timedelta(seconds=n * SECONDS_BETWEEN_PLAYS)
+    return {'played_at': played_at.strftime('%Y-%m-%dT%H:%M:%S.000Z'), 'track_name': f'Song {n % 5000}',
+            'artist': f'Artist {n % 700}', 'album': f'Album {n % 1200}', 'duration_ms': 200000 + n % 60000,
+            'track_id': f'track{n % 5000:018d}'}
+
+
+def append_csv(path, new_rows):
+    # What History_Script.py used to do on every run
+    df_new = pd.DataFrame(new_rows)
+    df_existing = pd.read_csv(path)
+    df_combined = pd.concat([df_existing, df_new], ignore_index=True)
+    df_combined.drop_duplicates(subset=['played_at'], inplace=True)
+    df_combined.sort_values(by='played_at', inplace=True)
+    df_combined.to_csv(path, index=False)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--plays', type=int, default=5_000_000, help='plays already in the history')
+    parser.add_argument('--runs', type=int, default=3, help='cron runs to time for each store')
+    parser.add_argument('--skip-csv', action='store_true', help='only time the SQLite store')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'history.db')
+        csv_path = os.path.join(tmp, 'history.csv')
+
+        start = time.perf_counter()
+        with HistoryStore(db_path) as store:
+            store.append(play(n) for n in range(args.plays))
+        print(f"Built a {args.plays:,} play history in {time.perf_counter() - start:.1f}s")
+        if not args.skip_csv:
+            with HistoryStore(db_path) as store:
+                store.export_csv(csv_path)
+
+        # Each run sees the last 25 stored plays again plus 25 new ones
+        runs = [[play(n) for n in range(args.plays + 25 * run - 25, args.plays + 25 * run + 25)]
+                for run in range(args.runs)]
+
+        with HistoryStore(db_path) as store:
+            sqlite_times = [timed(store.append, rows) for rows in runs]
+            assert store.count() == args.plays + 25 * args.runs
+        print(f"  HistoryStore append:      {min(sqlite_times) * 1000:10.2f} ms per run")
+
+        if not args.skip_csv:
+            csv_times = [timed(append_csv, csv_path, rows) for rows in runs]
+            assert len(pd.read_csv(csv_path, usecols=['played_at'])) == args.plays + 25 * args.runs
+            print(f"  CSV read-dedupe-rewrite:  {min(csv_times) * 1000:10.2f} ms per run "
+                  f"({min(csv_times) / min(sqlite_times):,.0f}x slower)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Compare playlist page payloads with and without a `fields` projection.
+
+Builds pages of full, realistically sized track objects and trims them the
+way Spotify's ``fields`` filter does server side, for each projection in
+Projections.py. Reports bytes on the wire and the time to decode the JSON
+and parse it into records. Run from the repo root:
+
+    python -m benchmarks.bench_projection --pages 50
+"""
+import argparse
+import json
+import time
+
+from Projections import LIBRARY_FIELDS, SORTER_FIELDS, TRACK_ID_FIELDS, TRACK_NAME_FIELDS, parse_track
+
+MARKETS = ['AD', 'AE', 'AG', 'AL', 'AM', 'AO', 'AR', 'AT', 'AU', 'AZ', 'BA', 'BB', 'BD', 'BE', 'BF', 'BG',
+           'BH', 'BI', 'BJ', 'BN', 'BO', 'BR', 'BS', 'BT', 'BW', 'BY', 'BZ', 'CA', 'CD', 'CG', 'CH', 'CI',
+           'CL', 'CM', 'CO', 'CR', 'CV', 'CW', 'CY', 'CZ', 'DE', 'DJ', 'DK', 'DM', 'DO', 'DZ', 'EC', 'EE',
+           'EG', 'ES', 'ET', 'FI', 'FJ', 'FM', 'FR', 'GA', 'GB', 'GD', 'GE', 'GH', 'GM', 'GN', 'GQ', 'GR',
+           'GT', 'GW', 'GY', 'HK', 'HN', 'HR', 'HT', 'HU', 'ID', 'IE', 'IL', 'IN', 'IQ', 'IS', 'IT', 'JM',
+           'JO', 'JP', 'KE', 'KG', 'KH', 'KI', 'KM', 'KN', 'KR', 'KW', 'KZ', 'LA', 'LB', 'LC', 'LI', 'LK',
+           'LR', 'LS', 'LT', 'LU', 'LV', 'LY', 'MA', 'MC', 'MD', 'ME', 'MG', 'MH', 'MK', 'ML', 'MN', 'MO',
+           'MR', 'MT', 'MU', 'MV', 'MW', 'MX', 'MY', 'MZ', 'NA', 'NE', 'NG', 'NI', 'NL', 'NO', 'NP', 'NR',
+           'NZ', 'OM', 'PA', 'PE', 'PG', 'PH', 'PK', 'PL', 'PS', 'PT', 'PW', 'PY', 'QA', 'RO', 'RS', 'RW',
+           'SA', 'SB', 'SC', 'SE', 'SG', 'SI', 'SK', 'SL', 'SM', 'SN', 'SR', 'ST', 'SV', 'SZ', 'TD', 'TG',
+           'TH', 'TJ', 'TL', 'TN', 'TO', 'TR', 'TT', 'TV', 'TW', 'TZ', 'UA', 'UG', 'US', 'UY', 'UZ', 'VC',
+           'VE', 'VN', 'VU', 'WS', 'XK', 'ZA', 'ZM', 'ZW']
+
+
+def full_artist(n):
+    artist_id = f'{n:022d}'
+    return {'external_urls': {'spotify': f'https://open.spotify.com/artist/{artist_id}'},
+            'href': f'https://api.spotify.com/v1/artists/{artist_id}', 'id': artist_id,
+            'name': f'Artist {n}', 'type': 'artist', 'uri': f'spotify:artist:{artist_id}'}
+
+
+def full_item(n):
+    track_id = f'{n:022d}'
+    album_id = f'{n // 12:022d}'
+    artists = [full_artist(n % 997), full_artist(n % 89)]
+    return {
+        'added_at': '2024-05-01T12:00:00Z',
+        'added_by': {'external_urls': {'spotify': 'https://open.spotify.com/user/me'},
+                     'href': 'https://api.spotify.com/v1/users/me', 'id': 'me', 'type': 'user', 'uri': 'spotify:user:me'},
+        'is_local': False, 'primary_color': None, 'video_thumbnail': {'url': None},
+        'track': {
+            'album': {'album_type': 'album', 'artists': artists, 'available_markets': MARKETS,
+                      'external_urls': {'spotify': f'https://open.spotify.com/album/{album_id}'},
+                      'href': f'https://api.spotify.com/v1/albums/{album_id}', 'id': album_id,
+                      'images': [{'height': size, 'width': size,
+                                  'url': f'https://i.scdn.co/image/ab67616d0000{size:04d}{album_id}'}
+                                 for size in (640, 300, 64)],
+                      'name': f'Album {n // 12}', 'release_date': '2019-03-22', 'release_date_precision': 'day',
+                      'total_tracks': 12, 'type': 'album', 'uri': f'spotify:album:{album_id}'},
+            'artists': artists, 'available_markets': MARKETS, 'disc_number': 1, 'duration_ms': 201000 + n,
+            'episode': False, 'explicit': False, 'external_ids': {'isrc': f'USABC{n:07d}'},
+            'external_urls': {'spotify': f'https://open.spotify.com/track/{track_id}'},
+            'href': f'https://api.spotify.com/v1/tracks/{track_id}', 'id': track_id, 'is_local': False,
+            'name': f'Song {n}', 'popularity': n % 100,
+            'preview_url': f'https://p.scdn.co/mp3-preview/{track_id}', 'track': True,
+            'track_number': n % 12 + 1, 'type': 'track', 'uri': f'spotify:track:{track_id}'},
+    }
+
+
+def parse_fields(fields):
+    """Parse a Spotify fields filter like 'items(track(id,name)),next' into a nested dict."""
+    tree, stack, name = {}, [], ''
+    node = tree
+    for char in fields + ',':
+        if char == '(':
+            node[name] = {}
+            stack.append(node)
+            node, name = node[name], ''
+        elif char in ',)':
+            if name:
+                node[name] = None
+            name = ''
+            if char == ')':
+                node = stack.pop()
+        else:
+            name += char
+    return tree
+
+
+def project(value, tree):
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [project(element, tree) for element in value]
+    return {key: project(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+
+def measure(payloads):
+    start = time.perf_counter()
+    records = 0
+    for body in payloads:
+        for item in json.loads(body)['items']:
+            records += parse_track(item) is not None
+    return time.perf_counter() - start, records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=50, help='100-track pages to simulate')
+    args = parser.parse_args()
+
+    pages = [{'href': 'https://api.spotify.com/v1/playlists/x/tracks', 'limit': 100, 'offset': page * 100,
+              'total': args.pages * 100, 'next': None, 'previous': None,
+              'items': [full_item(page * 100 + n) for n in range(100)]}
+             for page in range(args.pages)]
+
+    full_payloads = [json.dumps(page).encode() for page in pages]
+    full_bytes = sum(map(len, full_payloads))
+    full_time, _ = measure(full_payloads)
+    print(f"{args.pages} pages x 100 tracks")
+    print(f"  {'no projection':<66} {full_bytes / 1e6:7.2f} MB  {full_time * 1000:7.1f} ms")
+
+    for name, fields in [('TRACK_ID_FIELDS', TRACK_ID_FIELDS), ('TRACK_NAME_FIELDS', TRACK_NAME_FIELDS),
+                         ('LIBRARY_FIELDS', LIBRARY_FIELDS), ('SORTER_FIELDS', SORTER_FIELDS)]:
+        tree = parse_fields(fields)
+        payloads = [json.dumps(project(page, tree)).encode() for page in pages]
+        size = sum(map(len, payloads))
+        elapsed, _ = measure(payloads)
+        print(f"  {name + ' ' + fields:<66} {size / 1e6:7.2f} MB  {elapsed * 1000:7.1f} ms  "
+              f"({full_bytes / size:.0f}x smaller, {full_time / elapsed:.0f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
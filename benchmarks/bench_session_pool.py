@@ -0,0 +1,80 @@
+"""Replay a recorded batch of Spotify requests against a local stub server.
+
+Compares one new connection per request (plain ``requests.get``, what
+sortOtherTLT.py used to do) with the pooled keep-alive session from
+SpotifyClient.build_session. Run from the repo root:
+
+    python -m benchmarks.bench_session_pool --rounds 20
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from SpotifyClient import build_session
+
+RECORDED_REQUESTS = os.path.join(os.path.dirname(__file__), 'recorded_requests.json')
+
+
+class StubSpotifyHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients that ask for keep-alive actually get it
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    body = json.dumps({'items': [], 'next': None}).encode()
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+def replay(send, base_url, recorded, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for request in recorded:
+            send(request['method'], base_url + request['path']).raise_for_status()
+    elapsed = time.perf_counter() - start
+    return rounds * len(recorded) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    with open(RECORDED_REQUESTS) as f:
+        recorded = json.load(f)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubSpotifyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    try:
+        before = replay(requests.request, base_url, recorded, args.rounds)
+        session = build_session(limiter=None)
+        after = replay(session.request, base_url, recorded, args.rounds)
+    finally:
+        server.shutdown()
+
+    print(f"Replayed {len(recorded)} recorded requests x {args.rounds} rounds")
+    print(f"  new connection per request: {before:8.1f} req/s")
+    print(f"  pooled keep-alive session:  {after:8.1f} req/s  ({after / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""A fake Spotify Web API as a plain ASGI app, for benchmarking offline.
+
+Serves deterministic synthetic data for the endpoints AsyncSpotify uses,
+with an optional per-request delay standing in for network latency. Use it
+in-process through ``httpx.ASGITransport(app=FakeSpotify())`` or serve it
+with any ASGI server.
+"""
+import asyncio
+import json
+import re
+import zlib
+from urllib.parse import parse_qs, urlencode
+
+
+class FakeSpotify:
+    def __init__(self, playlists=40, tracks_per_playlist=600, saved_episodes=300, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self.playlists = {f'playlist{p:04d}': [self._track(f'p{p}t{t}') for t in range(tracks_per_playlist)]
+                          for p in range(playlists)}
+        self.episodes = [{'id': f'episode{e:05d}', 'name': f'Episode {e}',
+                          'duration_ms': 60000 * (e % 120 + 1), 'show': {'name': f'Show {e % 7}'}}
+                         for e in range(saved_episodes)]
+
+    @staticmethod
+    def _track(track_id):
+        artist_id = f'artist{zlib.crc32(track_id.encode()) % 500:03d}'
+        return {'id': track_id, 'name': f'Song {track_id}', 'uri': f'spotify:track:{track_id}',
+                'duration_ms': 200000, 'album': {'name': 'Album', 'images': [{'url': 'x' * 60}] * 3},
+                'artists': [{'id': artist_id, 'name': f'Artist {artist_id}'}],
+                'available_markets': ['US', 'CA', 'GB', 'NZ'] * 20}
+
+    def _page(self, base_url, path, query, items, default_limit):
+        limit = int(query.get('limit', default_limit))
+        offset = int(query.get('offset', 0))
+        next_url = None
+        if offset + limit < len(items):
+            next_url = f'{base_url}{path}?' + urlencode({**query, 'offset': offset + limit, 'limit': limit})
+        return {'href': f'{base_url}{path}', 'items': items[offset:offset + limit], 'limit': limit,
+                'offset': offset, 'total': len(items), 'next': next_url, 'previous': None}
+
+    def route(self, base_url, path, query):
+        match = re.fullmatch(r'/v1/playlists/(\w+)/tracks', path)
+        if match:
+            tracks = self.playlists.get(match.group(1))
+            if tracks is None:
+                return 404, {'error': {'status': 404, 'message': 'Not found.'}}
+            items = [{'added_at': '2024-01-01T00:00:00Z', 'track': track} for track in tracks]
+            return 200, self._page(base_url, path, query, items, 100)
+        if path == '/v1/me/playlists':
+            items = [{'id': playlist_id, 'name': playlist_id, 'snapshot_id': 'snapshot',
+                      'tracks': {'total': len(tracks)}} for playlist_id, tracks in self.playlists.items()]
+            return 200, self._page(base_url, path, query, items, 20)
+        if path == '/v1/artists':
+            ids = query.get('ids', '').split(',')
+            return 200, {'artists': [{'id': artist_id, 'name': artist_id, 'genres': ['indie pop', 'bedroom pop']}
+                                     for artist_id in ids]}
+        if path == '/v1/audio-features':
+            ids = query.get('ids', '').split(',')
+            return 200, {'audio_features': [{'id': track_id, 'danceability': 0.5, 'energy': 0.5, 'speechiness': 0.1,
+                                             'acousticness': 0.2, 'instrumentalness': 0.0, 'liveness': 0.1,
+                                             'valence': 0.5, 'tempo': 120.0} for track_id in ids]}
+        if path == '/v1/me/episodes':
+            items = [{'episode': episode} for episode in self.episodes]
+            return 200, self._page(base_url, path, query, items, 20)
+        if path == '/v1/search':
+            items = [self._track(f"search-{query.get('q', '')}-{n}") for n in range(1000)]
+            return 200, {'tracks': self._page(base_url, path, query, items, 10)}
+        return 404, {'error': {'status': 404, 'message': 'Service not found'}}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        headers = dict(scope['headers'])
+        host = headers.get(b'host', b'fake-spotify').decode()
+        base_url = f"{scope.get('scheme', 'http')}://{host}"
+        query = {key: values[-1] for key, values in parse_qs(scope['query_string'].decode()).items()}
+        status, payload = self.route(base_url, scope['path'], query)
+
+        body = json.dumps(payload).encode()
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})